@@ -1,5 +1,6 @@
-# Import the envs module so that envs register themselves
-import gym_minigrid.envs
+# Register the environments, without importing their modules
+from gym_minigrid.register import register_envs
+register_envs()
 
 # Import wrappers so it's accessible when installing with pip
 import gym_minigrid.wrappers
@@ -1,24 +1,55 @@
-from gym_minigrid.envs.empty import *
-from gym_minigrid.envs.doorkey import *
-from gym_minigrid.envs.multiroom import *
-from gym_minigrid.envs.fetch import *
-from gym_minigrid.envs.gotoobject import *
-from gym_minigrid.envs.gotodoor import *
-from gym_minigrid.envs.putnear import *
-from gym_minigrid.envs.lockedroom import *
-from gym_minigrid.envs.keycorridor import *
-from gym_minigrid.envs.unlock import *
-from gym_minigrid.envs.unlockpickup import *
-from gym_minigrid.envs.blockedunlockpickup import *
-from gym_minigrid.envs.playground_v0 import *
-from gym_minigrid.envs.redbluedoors import *
-from gym_minigrid.envs.obstructedmaze import *
-from gym_minigrid.envs.memory import *
-from gym_minigrid.envs.fourrooms import *
-from gym_minigrid.envs.crossing import *
-from gym_minigrid.envs.lavagap import *
-from gym_minigrid.envs.dynamicobstacles import *
-from gym_minigrid.envs.distshift import *
-from gym_minigrid.envs.dynamic_minigrid import *
-from gym_minigrid.envs.one_sand_element import *
+# The environment modules are only imported when one of their classes is
+# accessed, e.g. gym_minigrid.envs.DoorKeyEnv, or when gym.make() makes
+# one of their environments (see register.py)
 
+import importlib
+
+# The base classes, objects and constants are re-exported as they were
+# when every environment module was star-imported here
+from gym_minigrid import minigrid as _minigrid
+from gym_minigrid.minigrid import *
+from gym_minigrid.register import ENV_TABLE, register
+
+# Names defined in the environment modules which aren't the class of a
+# registered environment, e.g. base classes
+_EXTRA_CLASSES = [
+    ('multiroom', ['Room', 'MultiRoomEnv']),
+    ('lockedroom', ['Room']),
+    ('keycorridor', ['KeyCorridor']),
+    ('obstructedmaze', ['ObstructedMazeEnv']),
+    ('memory', ['MemoryEnv']),
+    ('crossing', ['CrossingEnv']),
+    ('lavagap', ['LavaGapEnv']),
+    ('distshift', ['DistShiftEnv']),
+    ('dynamic_minigrid', [
+        'Alteration', 'JournalEntry', 'AlterationJournal', 'DynamicMiniGrid',
+    ]),
+    ('one_sand_element', ['OneSandElementEnv']),
+]
+
+# Module of each class. When two modules define the same name, the
+# last one takes precedence
+_CLASS_MODULES = {}
+for _module, _envs in ENV_TABLE:
+    for _env_id, _name in _envs:
+        _CLASS_MODULES[_name] = _module
+for _module, _names in _EXTRA_CLASSES:
+    for _name in _names:
+        _CLASS_MODULES[_name] = _module
+del _module, _envs, _env_id, _names, _name
+
+__all__ = [
+    name for name in vars(_minigrid) if not name.startswith('_')
+] + ['register'] + list(_CLASS_MODULES)
+
+def __getattr__(name):
+    module = _CLASS_MODULES.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    value = getattr(importlib.import_module(__name__ + '.' + module), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
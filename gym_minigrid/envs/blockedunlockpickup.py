@@ -1,6 +1,5 @@
 from gym_minigrid.minigrid import Ball
 from gym_minigrid.roomgrid import RoomGrid
-from gym_minigrid.register import register
 
 class BlockedUnlockPickup(RoomGrid):
     """
@@ -8,6 +7,8 @@ class BlockedUnlockPickup(RoomGrid):
     in another room
     """
 
+    level_state_attrs = RoomGrid.level_state_attrs + ('obj',)
+
     def __init__(self, seed=None):
         room_size = 6
         super().__init__(
@@ -45,8 +46,3 @@ class BlockedUnlockPickup(RoomGrid):
                 done = True
 
         return obs, reward, done, info
-
-register(
-    id='MiniGrid-BlockedUnlockPickup-v0',
-    entry_point='gym_minigrid.envs:BlockedUnlockPickup'
-)
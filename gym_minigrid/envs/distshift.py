@@ -1,5 +1,4 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 class DistShiftEnv(MiniGridEnv):
     """
@@ -58,13 +57,3 @@ class DistShift1(DistShiftEnv):
 class DistShift2(DistShiftEnv):
     def __init__(self):
         super().__init__(strip2_row=5)
-
-register(
-    id='MiniGrid-DistShift1-v0',
-    entry_point='gym_minigrid.envs:DistShift1'
-)
-
-register(
-    id='MiniGrid-DistShift2-v0',
-    entry_point='gym_minigrid.envs:DistShift2'
-)
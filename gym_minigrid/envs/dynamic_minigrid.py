@@ -1,7 +1,145 @@
+import struct
+from collections import namedtuple
+
 import numpy as np
-import warnings
 
-from gym_minigrid.minigrid import MiniGridEnv, Grid, Goal, Lava, Sand, Wall
+from gym_minigrid.minigrid import MiniGridEnv, Grid, Goal, Lava, Sand, Wall, WorldObj, OBJECT_TO_IDX
+from gym_minigrid.planning import ReachabilityTracker, is_passable, passable_mask, goal_mask, \
+    batch_shortest_path_lengths, batch_view_masks, view_footprint
+
+# Alteration of a DynamicMiniGrid, as a delta on the encoded grid: the
+# (x, y, encoding) of the cells it sets, and the new agent start pose, or
+# None if it doesn't move the agent. kind is the key of prob_dict it was
+# sampled for
+Alteration = namedtuple('Alteration', ['kind', 'cells', 'start_pos', 'start_dir'])
+
+# Encoding of an empty cell
+EMPTY_ENCODING = (OBJECT_TO_IDX['empty'], 0, 0)
+
+# Record of an applied alteration in an AlterationJournal: the
+# (x, y, old encoding, new encoding) of the cells it set, and the agent
+# start pose before and after it
+JournalEntry = namedtuple('JournalEntry', [
+    'cells',
+    'old_start_pos',
+    'old_start_dir',
+    'new_start_pos',
+    'new_start_dir'
+])
+
+
+class AlterationJournal:
+    """
+    Journal of the alterations applied to a DynamicMiniGrid, stored as
+    deltas, which allows undoing and redoing them one at a time and
+    checking out any version of the environment (version n being the
+    environment after the first n alterations)
+    """
+
+    # Binary log layout, see to_bytes()
+    MAGIC = b'MGAJ'
+    HEADER = struct.Struct('<4sII')
+    ENTRY_DTYPE = np.dtype([
+        ('num_cells', '<u2'),
+        ('old_start_pos', '<i2', (2,)),
+        ('old_start_dir', 'u1'),
+        ('new_start_pos', '<i2', (2,)),
+        ('new_start_dir', 'u1'),
+    ])
+    CELL_DTYPE = np.dtype([
+        ('pos', '<u2', (2,)),
+        ('old', 'u1', (3,)),
+        ('new', 'u1', (3,)),
+    ])
+
+    def __init__(self, entries=(), position=None):
+        self.entries = list(entries)
+
+        # Number of entries applied to the environment, the others were undone
+        self.position = len(self.entries) if position is None else position
+
+    def __len__(self):
+        return len(self.entries)
+
+    def record(self, entry):
+        """
+        Add an entry after the current position, discarding the entries
+        which were undone
+        """
+
+        del self.entries[self.position:]
+        self.entries.append(entry)
+        self.position += 1
+
+    def to_bytes(self):
+        """
+        Serialize the journal to a compact binary log: a header followed by
+        an array of fixed-size entry records and an array of cell records
+        """
+
+        entries = np.zeros(len(self.entries), dtype=self.ENTRY_DTYPE)
+        cells = np.zeros(sum(len(e.cells) for e in self.entries), dtype=self.CELL_DTYPE)
+
+        cell_idx = 0
+        for record, entry in zip(entries, self.entries):
+            record['num_cells'] = len(entry.cells)
+            record['old_start_pos'] = entry.old_start_pos
+            record['old_start_dir'] = entry.old_start_dir
+            record['new_start_pos'] = entry.new_start_pos
+            record['new_start_dir'] = entry.new_start_dir
+            for x, y, old, new in entry.cells:
+                cells[cell_idx] = ((x, y), old, new)
+                cell_idx += 1
+
+        header = self.HEADER.pack(self.MAGIC, len(self.entries), self.position)
+        return header + entries.tobytes() + cells.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Deserialize a journal serialized by to_bytes()
+        """
+
+        magic, num_entries, position = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('not an alteration journal')
+
+        offset = cls.HEADER.size
+        entries = np.frombuffer(data, dtype=cls.ENTRY_DTYPE, count=num_entries, offset=offset)
+        offset += entries.nbytes
+        cells = np.frombuffer(data, dtype=cls.CELL_DTYPE, offset=offset)
+        cells = [
+            (int(x), int(y), tuple(old.tolist()), tuple(new.tolist()))
+            for (x, y), old, new in zip(cells['pos'], cells['old'], cells['new'])
+        ]
+
+        journal = []
+        cell_idx = 0
+        for record in entries:
+            num_cells = int(record['num_cells'])
+            journal.append(JournalEntry(
+                tuple(cells[cell_idx:cell_idx + num_cells]),
+                tuple(record['old_start_pos'].tolist()),
+                int(record['old_start_dir']),
+                tuple(record['new_start_pos'].tolist()),
+                int(record['new_start_dir'])
+            ))
+            cell_idx += num_cells
+
+        return cls(journal, position)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+def _batch_shortest_path_lengths(args):
+    return batch_shortest_path_lengths(*args)
 
 
 class DynamicMiniGrid(MiniGridEnv):
@@ -9,13 +147,36 @@ class DynamicMiniGrid(MiniGridEnv):
     DynamicMiniGrid: Mini Grid Environment, that can dynamically change, by altering a single tile
     """
 
-    def __init__(self, size=8, agent_start_pos=(1, 1), agent_start_dir=0, agent_view_size=7, seed=1337):
+    level_state_attrs = ('goal_pos',)
+
+    def __init__(self, size=8, agent_start_pos=(1, 1), agent_start_dir=0, agent_view_size=7, seed=1337,
+                 lazy_init=None):
 
         # Copied from EmptyEnv Todo: Make this class a child of EmptyEnv?
         self.agent_start_pos = agent_start_pos
         self.agent_start_dir = agent_start_dir
+
+        # Distances from the agent start pose, updated by alter(), and the
+        # grid version they correspond to, see _reachability()
+        self._reach = None
+        self._reach_grid = None
+        self._reach_version = None
+
+        # Alterations applied since the last reset, see undo(), redo() and checkout()
+        self.journal = AlterationJournal()
+
+        # Position of the goal, kept up to date by the alterations,
+        # None before the first level or without a goal
+        self.goal_pos = None
+
         super().__init__( grid_size=size, max_steps=4 * size * size,
-                          see_through_walls=False, agent_view_size=agent_view_size, seed=seed)
+                          see_through_walls=False, agent_view_size=agent_view_size, seed=seed,
+                          lazy_init=lazy_init)
+
+    def reset(self):
+        # The journal records the alterations of the level generated here
+        self.journal = AlterationJournal()
+        return super().reset()
 
     def _gen_grid(self, width, height):
         # Create an empty grid
@@ -37,6 +198,14 @@ class DynamicMiniGrid(MiniGridEnv):
 
         self.mission = "get to the green goal square"
 
+    def _find_goal(self):
+        """
+        Position of the goal in the grid, or None if there is none
+        """
+
+        goals = self.grid.find('goal', 'green')
+        return goals[0] if goals else None
+
     def alter(self, prob_dict, visibility_check=True):
         """
         Changes a single element of the environment.
@@ -45,117 +214,357 @@ class DynamicMiniGrid(MiniGridEnv):
             (change start or goal position, add wall/lava). Elements must sum to 1
         :param visibility_check: bool. If true, checks whether the agent can see the reward
             at the start and rejects such a solution.
-        :return: boolean. True if the environment can be solved empirically within 10'000 steps.
+            Positions are sampled among all the candidates at once, and the environment is
+            left unchanged if there is none.
+        :return: boolean. True if the goal can be reached from the start position, see check_solvable().
+        """
+
+        if sum(prob_dict.values()) != 1.0:
+            raise ValueError('Probabilities do not sum to 1')
+
+        # Lazily constructed environments have no grid before the first reset
+        if self.grid is None:
+            self.reset()
+
+        self.apply_alteration(self._sample_alteration(prob_dict, visibility_check))
+
+        return self.check_solvable()[0]
+
+    def sample_alterations(self, prob_dict, num_alterations, visibility_check=False):
+        """
+        Sample alterations of the environment, each of a single element of the
+        current environment, without applying them. Use evaluate_alterations()
+        to check them and apply_alteration() to apply one of them.
+
+        :param prob_dict: dict. Dictionary of probabilties for each type of altering, see alter()
+        :param num_alterations: int. Number of alterations to sample
+        :param visibility_check: bool. If true, rejects the start and goal positions
+            from which the goal is in view, like alter(). evaluate_alterations() also
+            checks this for all the alterations at once.
+        :return: list of Alteration
         """
 
         if sum(prob_dict.values()) != 1.0:
             raise ValueError('Probabilities do not sum to 1')
 
-        def alter_start_pos():
-
-            def goal_in_view(pos, new_pos, dir, new_dir):
-                self.agent_pos = new_pos
-                self.agent_dir = new_dir
-                return_value = self.in_view(*self.goal_pos)
-                # reset the agent after check
-                self.agent_pos = pos
-                self.agent_dir = dir
-                return return_value
-
-            pos = self.agent_start_pos
-            dir = self.agent_start_dir
-            while pos == self.agent_start_pos:
-                new_pos = (self.np_random.randint(1, self.height - 1), # 1, -1 to avoid boarders
-                           self.np_random.randint(1, self.width - 1))
-                new_dir = self.np_random.randint(0, 4)  # 4 possible directions
-                if self.grid.get(*new_pos) is not None or new_pos == pos: # check field is empty and agent is not there
-                    continue
-                if visibility_check and goal_in_view(pos, new_pos, dir, new_dir):
-                    continue
-                # set the new pos & dir if accepted
-                self.agent_start_pos = new_pos
-                self.agent_pos = new_pos
-                self.agent_start_dir = new_dir
-                self.agent_dir = new_dir
-
-        def alter_goal_pos():
-            goal_pos = self.goal_pos
-            while goal_pos == self.goal_pos:
-                new_goal_pos = (self.np_random.randint(1, self.height-1),
-                            self.np_random.randint(1, self.width-1))
-                if self.grid.get(*new_goal_pos) is not None or new_goal_pos == self.agent_start_pos:
-                    continue
-                if visibility_check and self.in_view(*new_goal_pos):
-                    continue
-                self.goal_pos = new_goal_pos  # change the attribute
-                self.grid.set(*new_goal_pos, Goal())  # change the actual element in the grid
-                self.grid.set(*goal_pos, None)  # remove the previous goal
-
-        def set_or_remove_obj(obj):
-
-            while True:
-                rand_pos = (self.np_random.randint(1, self.height-1),
-                            self.np_random.randint(1, self.width-1))
-
-                if rand_pos == self.agent_start_pos or rand_pos == self.goal_pos:
-                    continue
-
-                if self.grid.get(*rand_pos) == obj:
-                    # remove obj
-                    self.grid.set(*rand_pos, None)
-                else: # replace even if there is an object of the other type
-                    self.grid.set(*rand_pos, obj)
-                break
-
-        random_float = self.np_random.uniform()
+        if self.grid is None:
+            self.reset()
+
+        return [
+            self._sample_alteration(prob_dict, visibility_check)
+            for _ in range(num_alterations)
+        ]
+
+    def evaluate_alterations(self, alterations, pool=None, chunk_size=64):
+        """
+        Check the solvability of the environment after each of a list of
+        alterations, and whether the goal is in view from the start pose,
+        with a breadth-first search run on all the altered grids at once.
+
+        :param alterations: list of Alteration, see sample_alterations()
+        :param pool: optional pool of workers with a map() method, e.g. a
+            multiprocessing.Pool, among which chunks of alterations are split
+        :return: tuple of (K,) arrays (solvable, steps, goal_in_view). steps
+            is the minimum number of actions to reach the goal, -1 if unsolvable
+        """
+
+        num_alterations = len(alterations)
+        grids = np.repeat(self.grid.encode()[None], num_alterations, axis=0)
+        start_pos = np.empty((num_alterations, 2), dtype=np.int64)
+        start_dir = np.empty(num_alterations, dtype=np.int64)
+
+        for k, alteration in enumerate(alterations):
+            for x, y, encoding in alteration.cells:
+                grids[k, x, y] = encoding
+            if alteration.start_pos is None:
+                start_pos[k] = self.agent_start_pos
+                start_dir[k] = self.agent_start_dir
+            else:
+                start_pos[k] = alteration.start_pos
+                start_dir[k] = alteration.start_dir
+
+        passable = passable_mask(grids)
+        goals = goal_mask(grids)
+
+        if pool is None:
+            steps = batch_shortest_path_lengths(passable, goals, start_pos, start_dir)
+        else:
+            chunks = [
+                (passable[i:i + chunk_size], goals[i:i + chunk_size],
+                 start_pos[i:i + chunk_size], start_dir[i:i + chunk_size])
+                for i in range(0, num_alterations, chunk_size)
+            ]
+            steps = np.concatenate(list(pool.map(_batch_shortest_path_lengths, chunks)))
+
+        view = batch_view_masks(
+            self.width,
+            self.height,
+            start_pos,
+            start_dir,
+            self.agent_view_size
+        )
+        goal_in_view = (view & goals).any(axis=(1, 2))
+
+        return steps >= 0, steps, goal_in_view
+
+    def apply_alteration(self, alteration):
+        """
+        Apply an alteration sampled by sample_alterations(), and record it in the journal
+        """
+
+        cells = []
+        for x, y, encoding in alteration.cells:
+            obj = self.grid.get(x, y)
+            old_encoding = EMPTY_ENCODING if obj is None else obj.encode()
+            cells.append((x, y, old_encoding, tuple(encoding)))
+
+        old_start = (tuple(self.agent_start_pos), self.agent_start_dir)
+        if alteration.start_pos is None:
+            new_start = old_start
+        else:
+            new_start = (tuple(alteration.start_pos), alteration.start_dir)
+
+        entry = JournalEntry(tuple(cells), *old_start, *new_start)
+        self.journal.record(entry)
+        self._apply_entry(entry)
+
+    def undo(self):
+        """
+        Undo the last alteration recorded in the journal
+        """
+
+        journal = self.journal
+        if journal.position == 0:
+            raise ValueError('No alteration to undo')
+
+        journal.position -= 1
+        self._apply_entry(journal.entries[journal.position], undo=True)
+
+    def redo(self):
+        """
+        Redo the last alteration undone
+        """
+
+        journal = self.journal
+        if journal.position == len(journal):
+            raise ValueError('No alteration to redo')
+
+        self._apply_entry(journal.entries[journal.position])
+        journal.position += 1
+
+    def checkout(self, version):
+        """
+        Undo or redo alterations to get the environment after the first
+        version alterations recorded in the journal
+        """
+
+        if not 0 <= version <= len(self.journal):
+            raise ValueError('Journal has no version %d' % version)
+
+        while self.journal.position > version:
+            self.undo()
+        while self.journal.position < version:
+            self.redo()
+
+    def load_journal(self, journal, version=None):
+        """
+        Replay a journal recorded by an environment constructed with the
+        same arguments, from the level generated by the last reset. The
+        alterations applied since then are undone first, and the journal
+        is copied, so that it isn't modified.
+
+        :param version: version to check out, the journal position by default
+        """
+
+        if self.grid is None:
+            self.reset()
+
+        if version is None:
+            version = journal.position
+
+        self.checkout(0)
+        self.journal = AlterationJournal(journal.entries, position=0)
+        self.checkout(version)
+
+    def _apply_entry(self, entry, undo=False):
+        self._materialize_obs()
+
+        reach = self._reachability()
+
+        for x, y, old_encoding, new_encoding in entry.cells:
+            obj = WorldObj.decode(*(old_encoding if undo else new_encoding))
+            self.grid.set(x, y, obj)
+            reach.set_passable(x, y, is_passable(obj))
+
+        # The distances are up to date, moving the start pose makes
+        # _reachability() recompute them
+        self._reach_version = self.grid._version
+
+        goal_idx = OBJECT_TO_IDX['goal']
+        if any(old[0] == goal_idx or new[0] == goal_idx for _, _, old, new in entry.cells):
+            self.goal_pos = self._find_goal()
+
+        if entry.old_start_pos != entry.new_start_pos or entry.old_start_dir != entry.new_start_dir:
+            if undo:
+                start_pos, start_dir = entry.old_start_pos, entry.old_start_dir
+            else:
+                start_pos, start_dir = entry.new_start_pos, entry.new_start_dir
+            self.agent_start_pos = start_pos
+            self.agent_pos = start_pos
+            self.agent_start_dir = start_dir
+            self.agent_dir = start_dir
+
+    def _sample_alteration(self, prob_dict, visibility_check):
+        """
+        Sample an alteration of a single element of the environment
+        """
+
+        random_float = self._rand_float(0, 1)
 
         if random_float < prob_dict["alter_start_pos"]:
-            alter_start_pos()
+            return self._propose_start_pos(visibility_check)
 
         elif random_float < prob_dict["alter_goal_pos"] + prob_dict["alter_start_pos"]:
-            alter_goal_pos()
+            return self._propose_goal_pos(visibility_check)
 
         elif random_float < prob_dict["wall"] + prob_dict["alter_goal_pos"] + prob_dict["alter_start_pos"]:
-            set_or_remove_obj(Wall())
+            return self._propose_set_or_remove_obj(Wall())
 
         elif random_float < prob_dict["lava"] + prob_dict["wall"] + prob_dict["alter_goal_pos"] + prob_dict["alter_start_pos"]:
-            set_or_remove_obj(Lava())
+            return self._propose_set_or_remove_obj(Lava())
         else:
-            set_or_remove_obj(Sand())
-
-        def is_solvable():
-            # empirical check: let a random agent take max_steps and see if it visited the goal
-            max_steps = 5000
-
-            if self.height * self.width > 100:
-                warnings.warn(f"Solvability takes {max_steps} with a random agent, "
-                              f"thus might wrong in large grids ", UserWarning)
-
-            reachable_pos = [self.agent_start_pos]
-            for _ in range(max_steps):
-                # take a (random) step
-                action = self.np_random.randint(low=0, high=3)  # 0 turn left, 1 turn right, 2 move
-                self.step(action)
-                reachable_pos.append(tuple(self.agent_pos))
-                if self.grid.get(*self.agent_pos) is not None and \
-                        self.grid.get(*self.agent_pos).type == Lava().type:
-                    # if the agent walks on lava reset it to initial position and direction
-                    self.agent_pos = self.agent_start_pos
-                    self.agent_dir = self.agent_start_dir
-                if self.goal_pos in reachable_pos:
-                    # reset the agent to its starting position
-                    self.agent_pos = self.agent_start_pos
-                    self.agent_dir = self.agent_start_dir
-                    return True
-            # reset the agent to its starting position
-            self.agent_pos = self.agent_start_pos
-            self.agent_dir = self.agent_start_dir
-            return False
+            return self._propose_set_or_remove_obj(Sand())
+
+    def _interior_mask(self):
+        """
+        Boolean (width, height) mask of the cells inside the surrounding walls
+        """
+
+        mask = np.zeros((self.width, self.height), dtype=bool)
+        mask[1:-1, 1:-1] = True
+        return mask
+
+    def _sample_candidate(self, mask):
+        """
+        Pick one of the indices where a mask is set, or None if there are none
+        """
 
-        return is_solvable()
+        candidates = np.argwhere(mask)
+        if len(candidates) == 0:
+            return None
+        return tuple(int(v) for v in candidates[self._rand_int(0, len(candidates))])
+
+    def _propose_start_pos(self, visibility_check):
+        # Empty cells inside the walls, except the current start position
+        mask = self.grid.free_mask() & self._interior_mask()
+        mask[tuple(self.agent_start_pos)] = False
+
+        # Poses indexed by position and direction
+        mask = np.repeat(mask[:, :, None], 4, axis=2)
+        if visibility_check and self.goal_pos is not None:
+            mask &= ~view_footprint(self.width, self.height, self.goal_pos, self.agent_view_size)
+
+        pose = self._sample_candidate(mask)
+        if pose is None:
+            # Nowhere to move the agent, leave the environment as it is
+            return Alteration('alter_start_pos', (), None, None)
+        return Alteration('alter_start_pos', (), pose[:2], pose[2])
+
+    def _propose_goal_pos(self, visibility_check):
+        goal_pos = self.goal_pos
+
+        mask = self.grid.free_mask() & self._interior_mask()
+        mask[tuple(self.agent_start_pos)] = False
+        if visibility_check:
+            mask &= ~batch_view_masks(
+                self.width,
+                self.height,
+                [self.agent_start_pos],
+                [self.agent_start_dir],
+                self.agent_view_size
+            )[0]
+
+        new_goal_pos = self._sample_candidate(mask)
+        if new_goal_pos is None:
+            return Alteration('alter_goal_pos', (), None, None)
+
+        # remove the previous goal, if any
+        cells = ((*new_goal_pos, Goal().encode()),)
+        if goal_pos is not None:
+            cells = ((*goal_pos, EMPTY_ENCODING),) + cells
+        return Alteration('alter_goal_pos', cells, None, None)
+
+    def _propose_set_or_remove_obj(self, obj):
+        mask = self._interior_mask()
+        mask[tuple(self.agent_start_pos)] = False
+        if self.goal_pos is not None:
+            mask[tuple(self.goal_pos)] = False
+
+        rand_pos = self._sample_candidate(mask)
+        if rand_pos is None:
+            return Alteration(obj.type, (), None, None)
+
+        if self.grid.get(*rand_pos) == obj:
+            # remove obj
+            encoding = EMPTY_ENCODING
+        else: # replace even if there is an object of the other type
+            encoding = obj.encode()
+        return Alteration(obj.type, ((*rand_pos, encoding),), None, None)
+
+    def check_solvable(self):
+        """
+        Exact solvability check, using the distances from the agent start
+        pose to all its poses (see planning.py), which alter() updates
+        incrementally. Doesn't use the random number generator.
+
+        :return: tuple (bool, int). Whether the goal can be reached without
+            walking on lava, and the minimum number of actions to reach it
+            (None if it can't be reached)
+        """
+
+        steps = self._reachability().goal_distance(self.grid.find('goal'))
+        return steps is not None, steps
+
+    def optimal_steps(self):
+        """
+        Minimum number of actions to get to the goal from the current agent
+        pose. From the start pose, the distances updated by alter() are used.
+        """
+
+        if tuple(self.agent_pos) == tuple(self.agent_start_pos) and self.agent_dir == self.agent_start_dir:
+            return self.check_solvable()[1]
+        return super().optimal_steps()
+
+    def _reachability(self):
+        """
+        Get the distances from the agent start pose, recomputed if the grid
+        or the start pose were changed other than by alter()
+        """
+
+        reach = self._reach
+        if reach is None or \
+                self._reach_grid is not self.grid or \
+                self._reach_version != self.grid._version or \
+                reach.start_pos != tuple(self.agent_start_pos) or \
+                reach.start_dir != self.agent_start_dir:
+            reach = ReachabilityTracker(
+                passable_mask(self.grid.encode()),
+                self.agent_start_pos,
+                self.agent_start_dir
+            )
+            self._reach = reach
+            self._reach_grid = self.grid
+            self._reach_version = self.grid._version
+
+        return reach
 
     def respawn(self):
         """ alternative to the reset method (which initializes an empty grid at every timestep"""
+        if self.grid is None:
+            return self.reset()
+
+        self._materialize_obs()
+
         self.agent_pos = self.agent_start_pos
         self.agent_dir = self.agent_start_dir
 
@@ -1,5 +1,4 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 from operator import add
 
 class DynamicObstaclesEnv(MiniGridEnv):
@@ -7,6 +6,8 @@ class DynamicObstaclesEnv(MiniGridEnv):
     Single-room square grid environment with moving obstacles
     """
 
+    level_state_attrs = ('obstacles',)
+
     def __init__(
             self,
             size=8,
@@ -62,6 +63,9 @@ class DynamicObstaclesEnv(MiniGridEnv):
         if action >= self.action_space.n:
             action = 0
 
+        # The obstacles move before MiniGridEnv.step() is called
+        self._materialize_obs()
+
         # Check if there is an obstacle in front of the agent
         front_cell = self.grid.get(*self.front_pos)
         not_clear = front_cell and front_cell.type != 'goal'
@@ -107,33 +111,3 @@ class DynamicObstaclesRandomEnv6x6(DynamicObstaclesEnv):
 class DynamicObstaclesEnv16x16(DynamicObstaclesEnv):
     def __init__(self):
         super().__init__(size=16, n_obstacles=8)
-
-register(
-    id='MiniGrid-Dynamic-Obstacles-5x5-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesEnv5x5'
-)
-
-register(
-    id='MiniGrid-Dynamic-Obstacles-Random-5x5-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesRandomEnv5x5'
-)
-
-register(
-    id='MiniGrid-Dynamic-Obstacles-6x6-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesEnv6x6'
-)
-
-register(
-    id='MiniGrid-Dynamic-Obstacles-Random-6x6-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesRandomEnv6x6'
-)
-
-register(
-    id='MiniGrid-Dynamic-Obstacles-8x8-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesEnv'
-)
-
-register(
-    id='MiniGrid-Dynamic-Obstacles-16x16-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesEnv16x16'
-)
@@ -1,5 +1,4 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 class FetchEnv(MiniGridEnv):
     """
@@ -7,6 +6,8 @@ class FetchEnv(MiniGridEnv):
     named using English text strings
     """
 
+    level_state_attrs = ('targetType', 'targetColor')
+
     def __init__(
         self,
         size=8,
@@ -92,18 +93,3 @@ class FetchEnv5x5N2(FetchEnv):
 class FetchEnv6x6N2(FetchEnv):
     def __init__(self):
         super().__init__(size=6, numObjs=2)
-
-register(
-    id='MiniGrid-Fetch-5x5-N2-v0',
-    entry_point='gym_minigrid.envs:FetchEnv5x5N2'
-)
-
-register(
-    id='MiniGrid-Fetch-6x6-N2-v0',
-    entry_point='gym_minigrid.envs:FetchEnv6x6N2'
-)
-
-register(
-    id='MiniGrid-Fetch-8x8-N3-v0',
-    entry_point='gym_minigrid.envs:FetchEnv'
-)
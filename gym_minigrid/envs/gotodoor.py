@@ -1,5 +1,4 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 class GoToDoorEnv(MiniGridEnv):
     """
@@ -7,6 +6,8 @@ class GoToDoorEnv(MiniGridEnv):
     named using an English text string
     """
 
+    level_state_attrs = ('target_pos', 'target_color')
+
     def __init__(
         self,
         size=5
@@ -87,18 +88,3 @@ class GoToDoor8x8Env(GoToDoorEnv):
 class GoToDoor6x6Env(GoToDoorEnv):
     def __init__(self):
         super().__init__(size=6)
-
-register(
-    id='MiniGrid-GoToDoor-5x5-v0',
-    entry_point='gym_minigrid.envs:GoToDoorEnv'
-)
-
-register(
-    id='MiniGrid-GoToDoor-6x6-v0',
-    entry_point='gym_minigrid.envs:GoToDoor6x6Env'
-)
-
-register(
-    id='MiniGrid-GoToDoor-8x8-v0',
-    entry_point='gym_minigrid.envs:GoToDoor8x8Env'
-)
@@ -1,6 +1,5 @@
 from gym import spaces
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 class Room:
     def __init__(self,
@@ -28,6 +27,8 @@ class LockedRoom(MiniGridEnv):
     named using an English text string
     """
 
+    level_state_attrs = ('rooms',)
+
     def __init__(
         self,
         size=19
@@ -117,8 +118,3 @@ class LockedRoom(MiniGridEnv):
     def step(self, action):
         obs, reward, done, info = MiniGridEnv.step(self, action)
         return obs, reward, done, info
-
-register(
-    id='MiniGrid-LockedRoom-v0',
-    entry_point='gym_minigrid.envs:LockedRoom'
-)
@@ -1,5 +1,4 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 class Room:
     def __init__(self,
@@ -18,10 +17,15 @@ class MultiRoomEnv(MiniGridEnv):
     Environment with multiple rooms (subgoals)
     """
 
+    level_state_attrs = ('rooms', 'goal_pos')
+
     def __init__(self,
         minNumRooms,
         maxNumRooms,
-        maxRoomSize=10
+        maxRoomSize=10,
+        size=25,
+        maxRestarts=1000,
+        maxPlacements=1000
     ):
         assert minNumRooms > 0
         assert maxNumRooms >= minNumRooms
@@ -31,10 +35,15 @@ class MultiRoomEnv(MiniGridEnv):
         self.maxNumRooms = maxNumRooms
         self.maxRoomSize = maxRoomSize
 
+        # Number of times the layout may be restarted from a new first room,
+        # and number of rooms which may be tried for each layout
+        self.maxRestarts = maxRestarts
+        self.maxPlacements = maxPlacements
+
         self.rooms = []
 
         super(MultiRoomEnv, self).__init__(
-            grid_size=25,
+            grid_size=size,
             max_steps=self.maxNumRooms * 20
         )
 
@@ -44,27 +53,40 @@ class MultiRoomEnv(MiniGridEnv):
         # Choose a random number of rooms to generate
         numRooms = self._rand_int(self.minNumRooms, self.maxNumRooms+1)
 
+        numRestarts = 0
+
         while len(roomList) < numRooms:
-            curRoomList = []
+            # This is to handle layouts which can't fit in the grid
+            if numRestarts > self.maxRestarts:
+                raise RecursionError('failed to place the rooms in MultiRoomEnv')
+            if numRestarts > 0:
+                self._gen_retry()
+            numRestarts += 1
+
+            roomList = []
+
+            # Occupancy bitmap of the rooms placed so far. Each cell holds
+            # 1 + the index of the first room covering it, or 0 if free
+            occupancy = np.zeros((width, height), dtype=np.int32)
 
             entryDoorPos = (
                 self._rand_int(0, width - 2),
-                self._rand_int(0, width - 2)
+                self._rand_int(0, height - 2)
             )
 
-            # Recursively place the rooms
+            # Recursively place the rooms, backtracking when the
+            # following rooms can't be placed
             self._placeRoom(
                 numRooms,
-                roomList=curRoomList,
+                roomList=roomList,
                 minSz=4,
                 maxSz=self.maxRoomSize,
                 entryDoorWall=2,
-                entryDoorPos=entryDoorPos
+                entryDoorPos=entryDoorPos,
+                occupancy=occupancy,
+                budget=[self.maxPlacements]
             )
 
-            if len(curRoomList) > len(roomList):
-                roomList = curRoomList
-
         # Store the list of rooms in this environment
         assert len(roomList) > 0
         self.rooms = roomList
@@ -123,8 +145,24 @@ class MultiRoomEnv(MiniGridEnv):
         minSz,
         maxSz,
         entryDoorWall,
-        entryDoorPos
+        entryDoorPos,
+        occupancy,
+        budget
     ):
+        """
+        Place a room and, recursively, the numLeft-1 rooms following it.
+        Returns True if all the rooms could be placed. Otherwise, the rooms
+        placed by this call are removed from roomList and occupancy.
+
+        :param occupancy: bitmap of the cells covered by the rooms in roomList
+        :param budget: single-element list holding the number of rooms
+            which may still be tried, shared by all the recursive calls
+        """
+
+        if budget[0] <= 0:
+            return False
+        budget[0] -= 1
+
         # Choose the room size randomly
         sizeX = self._rand_int(minSz, maxSz+1)
         sizeY = self._rand_int(minSz, maxSz+1)
@@ -157,20 +195,19 @@ class MultiRoomEnv(MiniGridEnv):
 
         # If the room is out of the grid, can't place a room here
         if topX < 0 or topY < 0:
+            self._gen_retry()
             return False
         if topX + sizeX > self.width or topY + sizeY >= self.height:
+            self._gen_retry()
             return False
 
-        # If the room intersects with previous rooms, can't place it here
-        for room in roomList[:-1]:
-            nonOverlap = \
-                topX + sizeX < room.top[0] or \
-                room.top[0] + room.size[0] <= topX or \
-                topY + sizeY < room.top[1] or \
-                room.top[1] + room.size[1] <= topY
-
-            if not nonOverlap:
-                return False
+        # If the room intersects with rooms other than the previous one,
+        # which shares the wall of the entry door, can't place it here
+        region = occupancy[topX:topX + sizeX, topY:topY + sizeY]
+        prevOwner = len(roomList)
+        if np.any((region != 0) & (region != prevOwner)):
+            self._gen_retry()
+            return False
 
         # Add this room to the list
         roomList.append(Room(
@@ -179,6 +216,8 @@ class MultiRoomEnv(MiniGridEnv):
             entryDoorPos,
             None
         ))
+        owner = len(roomList)
+        region[region == 0] = owner
 
         # If this was the last room, stop
         if numLeft == 1:
@@ -228,13 +267,19 @@ class MultiRoomEnv(MiniGridEnv):
                 minSz=minSz,
                 maxSz=maxSz,
                 entryDoorWall=nextEntryWall,
-                entryDoorPos=exitDoorPos
+                entryDoorPos=exitDoorPos,
+                occupancy=occupancy,
+                budget=budget
             )
 
             if success:
-                break
+                return True
 
-        return True
+        # The following rooms can't be placed, backtrack
+        roomList.pop()
+        region[region == owner] = 0
+
+        return False
 
 class MultiRoomEnvN2S4(MultiRoomEnv):
     def __init__(self):
@@ -258,18 +303,3 @@ class MultiRoomEnvN6(MultiRoomEnv):
             minNumRooms=6,
             maxNumRooms=6
         )
-
-register(
-    id='MiniGrid-MultiRoom-N2-S4-v0',
-    entry_point='gym_minigrid.envs:MultiRoomEnvN2S4'
-)
-
-register(
-    id='MiniGrid-MultiRoom-N4-S5-v0',
-    entry_point='gym_minigrid.envs:MultiRoomEnvN4S5'
-)
-
-register(
-    id='MiniGrid-MultiRoom-N6-v0',
-    entry_point='gym_minigrid.envs:MultiRoomEnvN6'
-)
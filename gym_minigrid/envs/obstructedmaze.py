@@ -1,6 +1,5 @@
 from gym_minigrid.minigrid import *
 from gym_minigrid.roomgrid import RoomGrid
-from gym_minigrid.register import register
 
 class ObstructedMazeEnv(RoomGrid):
     """
@@ -8,6 +7,10 @@ class ObstructedMazeEnv(RoomGrid):
     doors may be obstructed by a ball and keys may be hidden in boxes.
     """
 
+    level_state_attrs = RoomGrid.level_state_attrs + (
+        'door_colors', 'ball_to_find_color', 'blocking_ball_color', 'box_color'
+    )
+
     def __init__(self,
         num_rows,
         num_cols,
@@ -79,6 +82,8 @@ class ObstructedMaze_1Dlhb(ObstructedMazeEnv):
     rooms. Doors are obstructed by a ball and keys are hidden in boxes.
     """
 
+    level_state_attrs = ObstructedMazeEnv.level_state_attrs + ('obj',)
+
     def __init__(self, key_in_box=True, blocked=True, seed=None):
         self.key_in_box = key_in_box
         self.blocked = blocked
@@ -116,6 +121,8 @@ class ObstructedMaze_Full(ObstructedMazeEnv):
     boxes.
     """
 
+    level_state_attrs = ObstructedMazeEnv.level_state_attrs + ('obj',)
+
     def __init__(self, agent_room=(1, 1), key_in_box=True, blocked=True,
                  num_quarters=4, num_rooms_visited=25, seed=None):
         self.agent_room = agent_room
@@ -177,48 +184,3 @@ class ObstructedMaze_1Q(ObstructedMaze_Full):
 class ObstructedMaze_2Q(ObstructedMaze_Full):
     def __init__(self, seed=None):
         super().__init__((1, 1), True, True, 2, 11, seed)
-
-register(
-    id="MiniGrid-ObstructedMaze-1Dl-v0",
-    entry_point="gym_minigrid.envs:ObstructedMaze_1Dl"
-)
-
-register(
-    id="MiniGrid-ObstructedMaze-1Dlh-v0",
-    entry_point="gym_minigrid.envs:ObstructedMaze_1Dlh"
-)
-
-register(
-    id="MiniGrid-ObstructedMaze-1Dlhb-v0",
-    entry_point="gym_minigrid.envs:ObstructedMaze_1Dlhb"
-)
-
-register(
-    id="MiniGrid-ObstructedMaze-2Dl-v0",
-    entry_point="gym_minigrid.envs:ObstructedMaze_2Dl"
-)
-
-register(
-    id="MiniGrid-ObstructedMaze-2Dlh-v0",
-    entry_point="gym_minigrid.envs:ObstructedMaze_2Dlh"
-)
-
-register(
-    id="MiniGrid-ObstructedMaze-2Dlhb-v0",
-    entry_point="gym_minigrid.envs:ObstructedMaze_2Dlhb"
-)
-
-register(
-    id="MiniGrid-ObstructedMaze-1Q-v0",
-    entry_point="gym_minigrid.envs:ObstructedMaze_1Q"
-)
-
-register(
-    id="MiniGrid-ObstructedMaze-2Q-v0",
-    entry_point="gym_minigrid.envs:ObstructedMaze_2Q"
-)
-
-register(
-    id="MiniGrid-ObstructedMaze-Full-v0",
-    entry_point="gym_minigrid.envs:ObstructedMaze_Full"
-)
\ No newline at end of file
@@ -1,5 +1,4 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 class OneSandElementEnv(MiniGridEnv):
     """
@@ -42,4 +41,4 @@ class OneSandElementEnv(MiniGridEnv):
         else:
             self.place_agent()
 
-        self.mission = "get to the green goal square"
\ No newline at end of file
+        self.mission = "get to the green goal square"
@@ -1,5 +1,4 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 class PutNearEnv(MiniGridEnv):
     """
@@ -7,6 +6,10 @@ class PutNearEnv(MiniGridEnv):
     another object through a natural language string.
     """
 
+    level_state_attrs = (
+        'move_type', 'moveColor', 'move_pos', 'target_type', 'target_color', 'target_pos'
+    )
+
     def __init__(
         self,
         size=6,
@@ -51,6 +54,7 @@ class PutNearEnv(MiniGridEnv):
 
             # If this object already exists, try again
             if (objType, objColor) in objs:
+                self._gen_retry()
                 continue
 
             if objType == 'key':
@@ -78,6 +82,7 @@ class PutNearEnv(MiniGridEnv):
             targetIdx = self._rand_int(0, len(objs))
             if targetIdx != objIdx:
                 break
+            self._gen_retry()
         self.target_type, self.target_color = objs[targetIdx]
         self.target_pos = objPos[targetIdx]
 
@@ -114,13 +119,3 @@ class PutNearEnv(MiniGridEnv):
 class PutNear8x8N3(PutNearEnv):
     def __init__(self):
         super().__init__(size=8, numObjs=3)
-
-register(
-    id='MiniGrid-PutNear-6x6-N2-v0',
-    entry_point='gym_minigrid.envs:PutNearEnv'
-)
-
-register(
-    id='MiniGrid-PutNear-8x8-N3-v0',
-    entry_point='gym_minigrid.envs:PutNear8x8N3'
-)
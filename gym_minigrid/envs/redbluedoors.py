@@ -1,5 +1,4 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 class RedBlueDoorEnv(MiniGridEnv):
     """
@@ -8,6 +7,8 @@ class RedBlueDoorEnv(MiniGridEnv):
     obtain a reward.
     """
 
+    level_state_attrs = ('red_door', 'blue_door')
+
     def __init__(self, size=8):
         self.size = size
 
@@ -68,13 +69,3 @@ class RedBlueDoorEnv(MiniGridEnv):
 class RedBlueDoorEnv6x6(RedBlueDoorEnv):
     def __init__(self):
         super().__init__(size=6)
-
-register(
-    id='MiniGrid-RedBlueDoors-6x6-v0',
-    entry_point='gym_minigrid.envs:RedBlueDoorEnv6x6'
-)
-
-register(
-    id='MiniGrid-RedBlueDoors-8x8-v0',
-    entry_point='gym_minigrid.envs:RedBlueDoorEnv'
-)
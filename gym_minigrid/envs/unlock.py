@@ -1,12 +1,13 @@
 from gym_minigrid.minigrid import Ball
 from gym_minigrid.roomgrid import RoomGrid
-from gym_minigrid.register import register
 
 class Unlock(RoomGrid):
     """
     Unlock a door
     """
 
+    level_state_attrs = RoomGrid.level_state_attrs + ('door',)
+
     def __init__(self, seed=None):
         room_size = 6
         super().__init__(
@@ -39,8 +40,3 @@ class Unlock(RoomGrid):
                 done = True
 
         return obs, reward, done, info
-
-register(
-    id='MiniGrid-Unlock-v0',
-    entry_point='gym_minigrid.envs:Unlock'
-)
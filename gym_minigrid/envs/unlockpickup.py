@@ -1,12 +1,13 @@
 from gym_minigrid.minigrid import Ball
 from gym_minigrid.roomgrid import RoomGrid
-from gym_minigrid.register import register
 
 class UnlockPickup(RoomGrid):
     """
     Unlock a door, then pick up a box in another room
     """
 
+    level_state_attrs = RoomGrid.level_state_attrs + ('obj',)
+
     def __init__(self, seed=None):
         room_size = 6
         super().__init__(
@@ -41,8 +42,3 @@ class UnlockPickup(RoomGrid):
                 done = True
 
         return obs, reward, done, info
-
-register(
-    id='MiniGrid-UnlockPickup-v0',
-    entry_point='gym_minigrid.envs:UnlockPickup'
-)
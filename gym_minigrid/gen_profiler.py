@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import time
+import argparse
+import multiprocessing
+
+import numpy as np
+import gym
+
+# Per-seed generation statistics recorded by profile_seeds()
+profile_dtype = np.dtype([
+    ('seed', np.int64),
+    ('time', np.float64),
+    ('draws', np.int64),
+    ('retries', np.int64),
+])
+
+_worker_env = None
+
+def _init_worker(env_id):
+    global _worker_env
+
+    # Make sure the MiniGrid environments are registered
+    import gym_minigrid
+
+    _worker_env = gym.make(env_id).unwrapped
+
+def _profile_seed(seed):
+    env = _worker_env
+
+    env.seed(seed)
+    start = time.perf_counter()
+    env.reset()
+    gen_time = time.perf_counter() - start
+
+    return (seed, gen_time, env.rng.num_draws, env.gen_retries)
+
+def profile_seeds(env_id, seeds, num_workers=None, chunksize=16):
+    """
+    Reset an environment with each of the given seeds, in a pool of
+    worker processes, and record the time taken by each reset along with
+    the number of random numbers drawn and of rejected attempts counted
+    while generating the level. Draws include the calls made directly to
+    the numpy generator of the environment, e.g. a shuffle counts as one
+    draw, and the draws of attempts abandoned by a generation budget.
+    """
+
+    seeds = [int(seed) for seed in seeds]
+
+    with multiprocessing.Pool(
+        num_workers,
+        initializer=_init_worker,
+        initargs=(env_id,)
+    ) as pool:
+        results = pool.map(_profile_seed, seeds, chunksize)
+
+    return np.array(results, dtype=profile_dtype)
+
+def report(results, num_slow=10):
+    """
+    Summarize the statistics recorded by profile_seeds() and list the
+    slowest seeds
+    """
+
+    lines = ['%d seeds' % len(results)]
+
+    for field, unit, scale in [('time', 'ms', 1000), ('draws', '', 1), ('retries', '', 1)]:
+        values = results[field] * scale
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        lines.append(
+            '%-8s mean %.2f%s  p50 %.2f  p90 %.2f  p99 %.2f  max %.2f'
+            % (field, values.mean(), unit, p50, p90, p99, values.max())
+        )
+
+    lines.append('slowest seeds:')
+    for row in np.sort(results, order='time')[::-1][:num_slow]:
+        lines.append(
+            '  seed %d: %.2fms, %d draws, %d retries'
+            % (row['seed'], row['time'] * 1000, row['draws'], row['retries'])
+        )
+
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--env-name",
+        dest="env_name",
+        help="gym environment to load",
+        default='MiniGrid-MultiRoom-N6-v0'
+    )
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--num-seeds", type=int, default=10000)
+    parser.add_argument("--num-workers", type=int, default=None)
+    parser.add_argument("--num-slow", type=int, default=10, help="number of slowest seeds listed")
+    parser.add_argument("--out", default=None, help="path of a .npy file to save the statistics to")
+    args = parser.parse_args()
+
+    results = profile_seeds(
+        args.env_name,
+        range(args.first_seed, args.first_seed + args.num_seeds),
+        num_workers=args.num_workers
+    )
+
+    if args.out:
+        np.save(args.out, results)
+
+    print(report(results, args.num_slow))
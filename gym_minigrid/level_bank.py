@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+import json
+import argparse
+
+import numpy as np
+import gym
+
+from gym_minigrid.minigrid import Grid
+
+def level_dtype(width, height, max_mission_len):
+    """
+    Record type used to store one level
+    """
+
+    return np.dtype([
+        ('seed', np.int64),
+        ('grid', np.uint8, (width, height, 3)),
+        ('agent_pos', np.int16, (2,)),
+        ('agent_dir', np.uint8),
+        ('mission', 'S%d' % max_mission_len),
+    ])
+
+def build_level_bank(env_id, seeds, path, max_mission_len=96, strict=True):
+    """
+    Generate the levels of a registered environment for a list of seeds
+    and store them in a memory-mapped file, along with a small JSON file
+    describing the bank.
+
+    Levels are stored as compact grid encodings, which do not include the
+    contents of boxes nor any environment-specific state set by _gen_grid
+    (e.g. the target object of the Fetch environment, declared in its
+    level_state_attrs). With strict=True, environments generating such
+    state are rejected.
+    """
+
+    # Make sure the MiniGrid environments are registered
+    import gym_minigrid
+
+    seeds = [int(seed) for seed in seeds]
+    env = gym.make(env_id).unwrapped
+
+    if strict:
+        # Levels only store the grid, agent pose and mission
+        extra = list(env.level_state_attrs)
+        if extra:
+            raise ValueError(
+                '%s sets state which can\'t be stored in a level bank: %s'
+                % (env_id, ', '.join(extra))
+            )
+
+    dtype = level_dtype(env.width, env.height, max_mission_len)
+    levels = np.lib.format.open_memmap(
+        path,
+        mode='w+',
+        dtype=dtype,
+        shape=(len(seeds),)
+    )
+
+    for idx, seed in enumerate(seeds):
+        env.seed(seed)
+        env.reset()
+
+        if strict:
+            for box_pos in env.grid.find('box'):
+                if env.grid.get(*box_pos).contains is not None:
+                    raise ValueError(
+                        '%s hides objects in boxes, which can\'t be stored in a level bank'
+                        % env_id
+                    )
+
+        mission = env.mission.encode('utf8')
+        assert len(mission) <= max_mission_len, 'mission string too long'
+
+        level = levels[idx]
+        level['seed'] = seed
+        level['grid'] = env.grid.encode()
+        level['agent_pos'] = env.agent_pos
+        level['agent_dir'] = env.agent_dir
+        level['mission'] = mission
+
+    levels.flush()
+    del levels
+
+    with open(path + '.json', 'w') as f:
+        json.dump({
+            'env_id': env_id,
+            'width': env.width,
+            'height': env.height,
+            'num_levels': len(seeds),
+        }, f)
+
+    env.close()
+
+class LevelBank:
+    """
+    Read-only bank of pregenerated levels, indexed by seed.
+    The levels are memory-mapped, so that processes loading the same bank
+    share the same pages.
+    """
+
+    def __init__(self, path):
+        with open(path + '.json') as f:
+            self.info = json.load(f)
+
+        self.env_id = self.info['env_id']
+        self.levels = np.load(path, mmap_mode='r')
+
+        seeds = np.asarray(self.levels['seed'])
+        self.first_seed = int(seeds[0]) if len(seeds) > 0 else 0
+
+        # Contiguous seed ranges are indexed without a lookup table
+        if np.array_equal(seeds, np.arange(self.first_seed, self.first_seed + len(seeds))):
+            self.seed_idx = None
+        else:
+            self.seed_idx = {int(seed): idx for idx, seed in enumerate(seeds)}
+
+    def __len__(self):
+        return len(self.levels)
+
+    def index(self, seed):
+        """
+        Get the index of the level for a given seed, or None
+        """
+
+        if seed is None:
+            return None
+
+        if self.seed_idx is not None:
+            return self.seed_idx.get(int(seed))
+
+        idx = int(seed) - self.first_seed
+        if 0 <= idx < len(self.levels):
+            return idx
+        return None
+
+    def __contains__(self, seed):
+        return self.index(seed) is not None
+
+    def load_level(self, env, seed):
+        """
+        Set the grid, agent pose and mission of an environment
+        from the level stored for a given seed
+        """
+
+        level = self.levels[self.index(seed)]
+        array = level['grid']
+        width, height, _ = array.shape
+        assert (width, height) == (env.width, env.height), 'level bank size mismatch'
+
+        grid, _ = Grid.decode(array)
+
+        # Objects know their position, as when placed by put_obj()
+        for i in range(width):
+            for j in range(height):
+                v = grid.get(i, j)
+                if v is not None:
+                    v.init_pos = (i, j)
+                    v.cur_pos = (i, j)
+
+        env.grid = grid
+        env.agent_pos = tuple(int(x) for x in level['agent_pos'])
+        env.agent_dir = int(level['agent_dir'])
+        env.mission = level['mission'].decode('utf8')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--env-name",
+        dest="env_name",
+        help="gym environment to load",
+        default='MiniGrid-Empty-Random-6x6-v0'
+    )
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--num-levels", type=int, default=10000)
+    parser.add_argument("--out", required=True, help="path of the level bank file")
+    parser.add_argument(
+        "--non-strict",
+        action="store_true",
+        help="store levels even if the environment sets state which isn't stored"
+    )
+    args = parser.parse_args()
+
+    build_level_bank(
+        args.env_name,
+        range(args.first_seed, args.first_seed + args.num_levels),
+        args.out,
+        strict=not args.non_strict
+    )
@@ -1,11 +1,15 @@
 import math
+import copy
+import time
 import hashlib
+import weakref
+from collections import OrderedDict
 import gym
 from enum import IntEnum
 import numpy as np
 from gym import error, spaces, utils
-from gym.utils import seeding
 from .rendering import *
+from .rng import make_rng
 
 # punishment when agent touches new type of object SAND
 SAND_PUNISHMENT = -0.1
@@ -13,6 +17,14 @@ SAND_PUNISHMENT = -0.1
 # Size in pixels of a tile in the full-scale human view
 TILE_PIXELS = 32
 
+# Number of random positions tried by place_obj before it samples directly
+# among the empty positions of the grid
+PLACE_OBJ_REJECTION_TRIES = 64
+
+# Types of objects which have no state changing during an episode, and which
+# levels restored from the reset cache can share with the cached level
+STATELESS_OBJ_TYPES = ('wall', 'floor', 'goal', 'lava', 'sand')
+
 # Map of color names to RGB values
 COLORS = {
     'red'   : np.array([255, 0, 0]),
@@ -368,25 +380,97 @@ class Grid:
 
         self.grid = [None] * width * height
 
+        # Index from (type, color) to the set of positions holding such an
+        # object. It is only built when first queried, so that the many
+        # temporary grids created for observations never pay for it
+        self._index = None
+
+        # Boolean mask of the empty cells, also built on first use
+        self._free = None
+
+        # Incremented whenever the contents of the grid change, so that
+        # structures derived from the grid can tell when they are stale
+        self._version = 0
+
+    def _build_index(self):
+        self._index = {}
+        for j in range(self.height):
+            for i in range(self.width):
+                v = self.grid[j * self.width + i]
+                if v is not None:
+                    self._index.setdefault((v.type, v.color), set()).add((i, j))
+
+    def free_mask(self):
+        """
+        Get a (width, height) boolean array marking the empty cells.
+        The array is updated in place as the grid changes.
+        """
+
+        if self._free is None:
+            self._free = np.array(
+                [v is None for v in self.grid],
+                dtype=bool
+            ).reshape(self.height, self.width).T
+
+        return self._free
+
+    def find(self, type, color=None):
+        """
+        Get the positions of all objects of a given type (and color),
+        sorted in row-major order
+        """
+
+        if self._index is None:
+            self._build_index()
+
+        if color is not None:
+            positions = self._index.get((type, color), ())
+        else:
+            positions = [
+                pos
+                for key, key_positions in self._index.items() if key[0] == type
+                for pos in key_positions
+            ]
+
+        return sorted(positions, key=lambda pos: (pos[1], pos[0]))
+
     def __contains__(self, key):
+        if self._index is None:
+            self._build_index()
+
         if isinstance(key, WorldObj):
-            for e in self.grid:
-                if e is key:
+            for pos in self._index.get((key.type, key.color), ()):
+                if self.get(*pos) is key:
                     return True
         elif isinstance(key, tuple):
-            for e in self.grid:
-                if e is None:
-                    continue
-                if (e.color, e.type) == key:
-                    return True
-                if key[0] is None and key[1] == e.type:
-                    return True
+            color, type = key
+            if color is None:
+                return any(k[0] == type for k in self._index)
+            return (type, color) in self._index
         return False
 
     def __eq__(self, other):
-        grid1  = self.encode()
-        grid2 = other.encode()
-        return np.array_equal(grid2, grid1)
+        if (self.width, self.height) != (other.width, other.height):
+            return False
+
+        if self._index is None:
+            self._build_index()
+        if other._index is None:
+            other._build_index()
+
+        # Grids holding different objects can't be equal
+        if self._index != other._index:
+            return False
+
+        # The only other encoded information is the state of the doors
+        for key, positions in self._index.items():
+            if key[0] != 'door':
+                continue
+            for pos in positions:
+                if self.get(*pos).encode() != other.get(*pos).encode():
+                    return False
+
+        return True
 
     def __ne__(self, other):
         return not self == other
@@ -395,10 +479,53 @@ class Grid:
         from copy import deepcopy
         return deepcopy(self)
 
+    def __deepcopy__(self, memo):
+        """
+        Structural copy, which copies each object of the grid once
+        and copies the object index instead of rebuilding it
+        """
+
+        grid = Grid.__new__(Grid)
+        memo[id(self)] = grid
+        grid.__dict__.update(self.__dict__)
+
+        objs = []
+        for v in self.grid:
+            if v is not None:
+                copied = memo.get(id(v))
+                v = copy.deepcopy(v, memo) if copied is None else copied
+            objs.append(v)
+        grid.grid = objs
+
+        if self._index is not None:
+            grid._index = {key: set(pos) for key, pos in self._index.items()}
+        if self._free is not None:
+            grid._free = self._free.copy()
+
+        return grid
+
     def set(self, i, j, v):
         assert i >= 0 and i < self.width
         assert j >= 0 and j < self.height
-        self.grid[j * self.width + i] = v
+
+        idx = j * self.width + i
+
+        if self._index is not None:
+            old = self.grid[idx]
+            if old is not None:
+                key = (old.type, old.color)
+                positions = self._index[key]
+                positions.discard((i, j))
+                if not positions:
+                    del self._index[key]
+            if v is not None:
+                self._index.setdefault((v.type, v.color), set()).add((i, j))
+
+        if self._free is not None:
+            self._free[i, j] = v is None
+
+        self.grid[idx] = v
+        self._version += 1
 
     def get(self, i, j):
         assert i >= 0 and i < self.width
@@ -517,12 +644,15 @@ class Grid:
         tile_size,
         agent_pos=None,
         agent_dir=None,
-        highlight_mask=None
+        highlight_mask=None,
+        out=None
     ):
         """
         Render this grid at a given scale
         :param r: target renderer object
         :param tile_size: tile size in pixels
+        :param out: optional uint8 array of shape (height_px, width_px, 3)
+            to render into instead of allocating a new one
         """
 
         if highlight_mask is None:
@@ -532,7 +662,11 @@ class Grid:
         width_px = self.width * tile_size
         height_px = self.height * tile_size
 
-        img = np.zeros(shape=(height_px, width_px, 3), dtype=np.uint8)
+        if out is None:
+            img = np.zeros(shape=(height_px, width_px, 3), dtype=np.uint8)
+        else:
+            assert out.shape == (height_px, width_px, 3), out.shape
+            img = out
 
         # Render the grid
         for j in range(0, self.height):
@@ -555,15 +689,22 @@ class Grid:
 
         return img
 
-    def encode(self, vis_mask=None):
+    def encode(self, vis_mask=None, out=None):
         """
         Produce a compact numpy encoding of the grid
+        :param out: optional uint8 array of shape (width, height, 3) to
+            write the encoding into instead of allocating a new one
         """
 
         if vis_mask is None:
             vis_mask = np.ones((self.width, self.height), dtype=bool)
 
-        array = np.zeros((self.width, self.height, 3), dtype='uint8')
+        if out is None:
+            array = np.zeros((self.width, self.height, 3), dtype='uint8')
+        else:
+            assert out.shape == (self.width, self.height, 3), out.shape
+            array = out
+            array.fill(0)
 
         for i in range(self.width):
             for j in range(self.height):
@@ -640,6 +781,109 @@ class Grid:
 
         return mask
 
+# Attributes which _gen_grid sets in every environment, see get_level_state()
+LEVEL_ATTRS = ('grid', 'agent_pos', 'agent_dir', 'mission')
+
+class GenBudgetExceeded(RecursionError):
+    """
+    Raised when the generation of a level goes past its time or retry budget
+    """
+
+class LazyObs(dict):
+    """
+    Observation dictionary whose 'image' is only generated when it is
+    read, so that wrappers which replace the image don't pay for it.
+    It behaves as a dict, and copies of it are plain dicts.
+    """
+
+    def __init__(self, gen_image, **fields):
+        super().__init__(image=None, **fields)
+        self._gen_image = gen_image
+
+    def materialize(self):
+        """
+        Generate the image, if it wasn't generated yet
+        """
+
+        gen_image = self._gen_image
+        if gen_image is not None:
+            self._gen_image = None
+            dict.__setitem__(self, 'image', gen_image())
+
+    def __getitem__(self, key):
+        if key == 'image':
+            self.materialize()
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key == 'image':
+            self.materialize()
+        return dict.get(self, key, default)
+
+    def __setitem__(self, key, value):
+        if key == 'image':
+            self._gen_image = None
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if key == 'image':
+            self._gen_image = None
+        dict.__delitem__(self, key)
+
+    def pop(self, key, *default):
+        if key == 'image':
+            self.materialize()
+        return dict.pop(self, key, *default)
+
+    # Overriding __iter__ makes dict(obs) and {**obs} go through __getitem__
+    def __iter__(self):
+        return dict.__iter__(self)
+
+    def items(self):
+        self.materialize()
+        return dict.items(self)
+
+    def values(self):
+        self.materialize()
+        return dict.values(self)
+
+    def copy(self):
+        self.materialize()
+        return dict(dict.items(self))
+
+    def update(self, *args, **kwargs):
+        self.materialize()
+        dict.update(self, *args, **kwargs)
+
+    def setdefault(self, key, default=None):
+        self.materialize()
+        return dict.setdefault(self, key, default)
+
+    def popitem(self):
+        self.materialize()
+        return dict.popitem(self)
+
+    def clear(self):
+        self._gen_image = None
+        dict.clear(self)
+
+    def __eq__(self, other):
+        self.materialize()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        self.materialize()
+        return dict.__ne__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self.materialize()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        return (dict, (self.copy(),))
+
 class MiniGridEnv(gym.Env):
     """
     2D grid world game environment
@@ -650,6 +894,29 @@ class MiniGridEnv(gym.Env):
         'video.frames_per_second' : 10
     }
 
+    # Random number service created by seed(), see rng.py. Set it to
+    # 'block' on an environment, then call seed(), to draw numbers faster
+    # at the cost of generating different levels than 'legacy' for a seed
+    rng_mode = 'legacy'
+
+    # Set to True to only configure environments in the constructor, and
+    # generate their first level at the first call to reset(). Without a
+    # call to seed() before it, that reset generates the level which the
+    # constructor would have generated, so unseeded lazy environments get
+    # their levels one reset earlier than eager ones
+    lazy_init = False
+
+    # Other attributes set by _gen_grid which are part of the level, e.g.
+    # the target object of a mission, see get_level_state()
+    level_state_attrs = ()
+
+    # Set by step_no_obs() while step() runs, so that no observation is generated
+    _skip_obs = False
+
+    # Weak reference to the last observation returned by gen_obs(), see
+    # _materialize_obs()
+    _last_obs = None
+
     # Enumeration of possible actions
     class Actions(IntEnum):
         # Turn left, turn right, move forward
@@ -675,7 +942,8 @@ class MiniGridEnv(gym.Env):
         max_steps=100,
         see_through_walls=False,
         seed=1337,
-        agent_view_size=7
+        agent_view_size=7,
+        lazy_init=None
     ):
         # Can't set both grid_size and width/height
         if grid_size:
@@ -722,21 +990,72 @@ class MiniGridEnv(gym.Env):
         self.agent_pos = None
         self.agent_dir = None
 
+        # Grid of the current level, None until the first reset
+        # when the environment is constructed lazily
+        self.grid = None
+
+        # Caller-provided observation buffers, see set_obs_buffers()
+        self.obs_buffers = None
+
+        # Bank of pregenerated levels, see set_level_bank()
+        self.level_bank = None
+
+        # Level generated ahead of time to use at the next reset,
+        # see gen_level_state() and set_next_level()
+        self._next_level = None
+
+        # Rejected attempts counted during the last level generation, and
+        # number of times it was restarted, see set_gen_budget(). The limits
+        # of the budget are only set while a level is generated.
+        self.gen_retries = 0
+        self.gen_reseeds = 0
+        self.gen_budget = None
+        self._gen_limits = None
+
+        # Levels cached by random number generator state, see set_reset_cache()
+        self.reset_cache = None
+        self.reset_cache_size = 0
+
+        # Distances to the goal, and the grid and grid version they were
+        # computed for, see goal_distance_field()
+        self._goal_dist = None
+        self._goal_dist_grid = None
+        self._goal_dist_version = None
+
         # Initialize the RNG
         self.seed(seed=seed)
 
-        # Initialize the state
-        self.reset()
+        # Initialize the state, unless lazy_init is set, in which case
+        # the first level is generated by the first call to reset()
+        if lazy_init is None:
+            lazy_init = self.lazy_init
+        self.lazy_init = lazy_init
+        if not lazy_init:
+            self.reset()
 
     def reset(self):
+        self._materialize_obs()
+
         # Current position and direction of the agent
         self.agent_pos = None
         self.agent_dir = None
 
+        # Seed passed to env.seed() since the last reset, if any
+        seed = self._reset_seed
+        self._reset_seed = None
+
         # Generate a new random grid at the start of each episode
         # To keep the same grid for each episode, call env.seed() with
         # the same seed before calling env.reset()
-        self._gen_grid(self.width, self.height)
+        if self._next_level is not None:
+            self.__dict__.update(self._next_level)
+            self._next_level = None
+        elif self.level_bank is not None and seed in self.level_bank:
+            self.level_bank.load_level(self, seed)
+        elif self.reset_cache is not None:
+            self._gen_grid_cached()
+        else:
+            self._gen_grid_checked()
 
         # These fields should be defined by _gen_grid
         assert self.agent_pos is not None
@@ -758,9 +1077,164 @@ class MiniGridEnv(gym.Env):
 
     def seed(self, seed=1337):
         # Seed the random number generator
-        self.np_random, _ = seeding.np_random(seed)
+        self.rng = make_rng(seed, self.rng_mode)
+        self.np_random = self.rng.np_random
+
+        # Remember the seed used to generate the next level
+        self._reset_seed = seed
+
         return [seed]
 
+    def set_level_bank(self, level_bank):
+        """
+        Load levels from a bank of pregenerated levels (see level_bank.py)
+        instead of generating them, whenever the environment is reset with
+        a seed stored in the bank, i.e. env.seed(k) followed by env.reset().
+        Other resets generate levels as usual. Note that loading a level
+        doesn't consume random numbers like generating it would.
+        Pass None to stop using the bank.
+        """
+
+        if level_bank is not None:
+            assert level_bank.info['width'] == self.width
+            assert level_bank.info['height'] == self.height
+        self.level_bank = level_bank
+
+    def set_reset_cache(self, max_size=128):
+        """
+        Cache the levels generated at reset, keyed by the state of the random
+        number generator before generating them. Resetting the environment
+        from a state seen before, e.g. after env.seed() with the same seed or
+        in environments whose generation doesn't use random numbers, then
+        restores a copy of the cached level instead of calling _gen_grid.
+        Only use this when _gen_grid depends on nothing but the random
+        number generator and the constructor arguments.
+        Pass None to stop caching levels.
+
+        :param max_size: number of levels kept, least recently used first out
+        """
+
+        if max_size is None:
+            self.reset_cache = None
+            self.reset_cache_size = 0
+        else:
+            assert max_size > 0
+            self.reset_cache = OrderedDict()
+            self.reset_cache_size = max_size
+
+    def set_gen_budget(self, max_time=None, max_retries=None, max_reseeds=10):
+        """
+        Abort the generation of levels going past a time or retry budget,
+        and generate them again with a random number generator derived
+        from the current one. Pass no budget to stop checking it.
+        Retry budgets reseed deterministically, time budgets depend on
+        the speed of the machine.
+
+        :param max_time: maximum generation time of a level, in seconds
+        :param max_retries: maximum number of rejected attempts while
+            generating a level, as counted by _gen_retry()
+        :param max_reseeds: number of times the generation of a level may
+            be restarted before GenBudgetExceeded is raised
+        """
+
+        if max_time is None and max_retries is None:
+            self.gen_budget = None
+        else:
+            self.gen_budget = (max_time, max_retries, max_reseeds)
+
+    def _gen_grid_checked(self):
+        """
+        Generate a new grid, within the generation budget if any
+        """
+
+        self.gen_retries = 0
+        self.gen_reseeds = 0
+
+        if self.gen_budget is None:
+            # Retries are only counted during the generation
+            self._gen_limits = (math.inf, math.inf)
+            try:
+                self._gen_grid(self.width, self.height)
+            finally:
+                self._gen_limits = None
+            return
+
+        max_time, max_retries, max_reseeds = self.gen_budget
+
+        while True:
+            self._gen_limits = (
+                math.inf if max_time is None else time.perf_counter() + max_time,
+                math.inf if max_retries is None else self.gen_retries + max_retries
+            )
+
+            try:
+                self._gen_grid(self.width, self.height)
+                return
+            except GenBudgetExceeded:
+                if self.gen_reseeds >= max_reseeds:
+                    raise
+                self.gen_reseeds += 1
+                # The draws of the abandoned attempts are still counted
+                num_draws = self.rng.num_draws
+                self.rng = self.rng.spawn(1)[0]
+                self.rng.num_draws = num_draws
+                self.np_random = self.rng.np_random
+            finally:
+                self._gen_limits = None
+
+    def _gen_retry(self, num_retries=1):
+        """
+        Count rejected attempts of the level generation, e.g. positions
+        rejected by place_obj, and abort the generation if it goes past
+        its budget. Attempts made outside of the generation, e.g. when
+        objects are moved by step(), aren't counted.
+        """
+
+        if self._gen_limits is None:
+            return
+
+        self.gen_retries += num_retries
+
+        deadline, max_retries = self._gen_limits
+        if self.gen_retries > max_retries or time.perf_counter() > deadline:
+            raise GenBudgetExceeded('level generation went past its budget')
+
+    def _gen_grid_cached(self):
+        """
+        Generate a new grid, or restore the level cached for the
+        current state of the random number generator
+        """
+
+        key = repr(self.rng.get_state())
+        entry = self.reset_cache.get(key)
+
+        if entry is None:
+            self._gen_grid_checked()
+            state = self.get_level_state()
+            shared = [
+                obj for obj in self.grid.grid
+                if obj is not None and obj.type in STATELESS_OBJ_TYPES
+            ]
+            entry = (self._copy_level(state, shared), shared, self.rng.get_state())
+            self.reset_cache[key] = entry
+            if len(self.reset_cache) > self.reset_cache_size:
+                self.reset_cache.popitem(last=False)
+        else:
+            self.reset_cache.move_to_end(key)
+            state, shared, rng_state = entry
+            self.__dict__.update(self._copy_level(state, shared))
+            self.rng.set_state(rng_state)
+
+    def _copy_level(self, state, shared):
+        """
+        Copy the state of a level, except for the objects in shared,
+        which can't change during an episode
+        """
+
+        memo = {id(obj): obj for obj in shared}
+        memo[id(self)] = self
+        return copy.deepcopy(state, memo)
+
     def hash(self, size=16):
         """Compute a hash that uniquely identifies the current state of the environment.
         :param size: Size of the hashing
@@ -842,6 +1316,37 @@ class MiniGridEnv(gym.Env):
     def _gen_grid(self, width, height):
         assert False, "_gen_grid needs to be implemented by each environment"
 
+    def get_level_state(self):
+        """
+        Get the attributes of the current level: those of LEVEL_ATTRS and
+        of level_state_attrs. The values aren't copied.
+        """
+
+        return {
+            name: self.__dict__[name]
+            for name in LEVEL_ATTRS + tuple(self.level_state_attrs)
+        }
+
+    def gen_level_state(self):
+        """
+        Generate a new level and return its state, see get_level_state(),
+        along with the random number generator, so that it can be installed
+        in another instance of the same environment with set_next_level()
+        """
+
+        self._gen_grid_checked()
+        state = self.get_level_state()
+        state['rng'] = self.rng
+        state['np_random'] = self.np_random
+        return state
+
+    def set_next_level(self, state):
+        """
+        Use a level produced by gen_level_state() at the next reset
+        """
+
+        self._next_level = state
+
     def _reward(self):
         """
         Compute the reward to be given upon success
@@ -849,6 +1354,70 @@ class MiniGridEnv(gym.Env):
 
         return 1 - 0.9 * (self.step_count / self.max_steps)
 
+    def goal_distance_field(self):
+        """
+        Minimum number of actions to get to a goal square from each agent
+        pose, as a (width, height, 4) array indexed by position and
+        direction, -1 where no goal can be reached. Computed by a
+        breadth-first search over the encoded grid (see planning.py), and
+        cached until the grid is changed.
+
+        Closed doors are opened on the way, at the cost of a toggle action.
+        Locked doors and objects which could be picked up are obstacles,
+        since the search doesn't plan picking up keys or moving objects.
+        """
+
+        from gym_minigrid.planning import goal_distance_field, goal_mask, passable_mask, closed_door_mask
+
+        if self._goal_dist is None or \
+                self._goal_dist_grid is not self.grid or \
+                self._goal_dist_version != self.grid._version:
+            array = self.grid.encode()
+            self._goal_dist = goal_distance_field(
+                passable_mask(array),
+                goal_mask(array),
+                closed_door_mask(array)
+            )
+            self._goal_dist_grid = self.grid
+            self._goal_dist_version = self.grid._version
+
+        return self._goal_dist
+
+    def optimal_steps(self):
+        """
+        Minimum number of actions to get to a goal square from the current
+        agent pose, see goal_distance_field(). None if no path is found,
+        either because there is none or because it needs actions which
+        aren't planned, e.g. unlocking doors.
+        """
+
+        steps = self.goal_distance_field()[self.agent_pos[0], self.agent_pos[1], self.agent_dir]
+        return None if steps < 0 else int(steps)
+
+    def optimal_return(self):
+        """
+        Highest return the agent can get from now on by going to a goal
+        square, as given by _reward() after optimal_steps() more steps.
+        0 if the goal can't be reached before the end of the episode, and
+        None if optimal_steps() finds no path.
+
+        Sand punishments aren't included, so on levels with sand this is
+        an upper bound, which is reached when a shortest path avoids sand.
+        """
+
+        steps = self.optimal_steps()
+        if steps is None:
+            return None
+        if self.step_count + steps > self.max_steps:
+            return 0
+
+        step_count = self.step_count
+        self.step_count = step_count + steps
+        try:
+            return self._reward()
+        finally:
+            self.step_count = step_count
+
     def _sand_punishment(self):
         """
         Reward (resp. punishment) received when touching new type of object SAND
@@ -861,21 +1430,21 @@ class MiniGridEnv(gym.Env):
         Generate random integer in [low,high[
         """
 
-        return self.np_random.randint(low, high)
+        return self.rng.integers(low, high)
 
     def _rand_float(self, low, high):
         """
         Generate random float in [low,high[
         """
 
-        return self.np_random.uniform(low, high)
+        return self.rng.uniform(low, high)
 
     def _rand_bool(self):
         """
         Generate random boolean value
         """
 
-        return (self.np_random.randint(0, 2) == 0)
+        return (self.rng.integers(0, 2) == 0)
 
     def _rand_elem(self, iterable):
         """
@@ -894,14 +1463,7 @@ class MiniGridEnv(gym.Env):
         lst = list(iterable)
         assert num_elems <= len(lst)
 
-        out = []
-
-        while len(out) < num_elems:
-            elem = self._rand_elem(lst)
-            lst.remove(elem)
-            out.append(elem)
-
-        return out
+        return self.rng.subset(lst, num_elems)
 
     def _rand_color(self):
         """
@@ -916,8 +1478,8 @@ class MiniGridEnv(gym.Env):
         """
 
         return (
-            self.np_random.randint(xLow, xHigh),
-            self.np_random.randint(yLow, yHigh)
+            self.rng.integers(xLow, xHigh),
+            self.rng.integers(yLow, yHigh)
         )
 
     def place_obj(self,
@@ -935,6 +1497,8 @@ class MiniGridEnv(gym.Env):
         :param reject_fn: function to filter out potential positions
         """
 
+        self._materialize_obs()
+
         if top is None:
             top = (0, 0)
         else:
@@ -943,9 +1507,26 @@ class MiniGridEnv(gym.Env):
         if size is None:
             size = (self.grid.width, self.grid.height)
 
+        x_max = min(top[0] + size[0], self.grid.width)
+        y_max = min(top[1] + size[1], self.grid.height)
+
+        # Empty positions in the rectangle, which aren't under the agent
+        free = self.grid.free_mask()[top[0]:x_max, top[1]:y_max]
+        num_free = int(free.sum())
+        if self.agent_pos is not None:
+            ax, ay = self.agent_pos
+            if top[0] <= ax < x_max and top[1] <= ay < y_max and free[ax - top[0], ay - top[1]]:
+                num_free -= 1
+
+        if num_free <= 0:
+            raise RecursionError('no empty position in place_obj')
+
         num_tries = 0
 
-        while True:
+        # Start with plain rejection sampling, which is fast when most
+        # positions are acceptable, and keeps the levels generated for
+        # existing seeds unchanged
+        while num_tries < PLACE_OBJ_REJECTION_TRIES:
             # This is to handle with rare cases where rejection sampling
             # gets stuck in an infinite loop
             if num_tries > max_tries:
@@ -954,8 +1535,8 @@ class MiniGridEnv(gym.Env):
             num_tries += 1
 
             pos = np.array((
-                self._rand_int(top[0], min(top[0] + size[0], self.grid.width)),
-                self._rand_int(top[1], min(top[1] + size[1], self.grid.height))
+                self._rand_int(top[0], x_max),
+                self._rand_int(top[1], y_max)
             ))
 
             # Don't place the object on top of another object
@@ -971,6 +1552,33 @@ class MiniGridEnv(gym.Env):
                 continue
 
             break
+        else:
+            # Sample directly among the remaining candidate positions,
+            # removing the ones rejected by the filtering criterion
+            candidates = np.argwhere(free) + top
+            if self.agent_pos is not None:
+                not_agent = np.any(candidates != np.array(self.agent_pos), axis=1)
+                candidates = candidates[not_agent]
+            candidates = list(candidates)
+
+            while True:
+                if not candidates or num_tries > max_tries:
+                    raise RecursionError('rejection sampling failed in place_obj')
+
+                num_tries += 1
+
+                idx = self._rand_int(0, len(candidates))
+                pos = candidates[idx]
+
+                if reject_fn and reject_fn(self, pos):
+                    candidates[idx] = candidates[-1]
+                    candidates.pop()
+                    continue
+
+                break
+
+        if num_tries > 1:
+            self._gen_retry(num_tries - 1)
 
         self.grid.set(*pos, obj)
 
@@ -985,6 +1593,7 @@ class MiniGridEnv(gym.Env):
         Put an object at a specific position in the grid
         """
 
+        self._materialize_obs()
         self.grid.set(i, j, obj)
         obj.init_pos = (i, j)
         obj.cur_pos = (i, j)
@@ -1122,14 +1731,17 @@ class MiniGridEnv(gym.Env):
             return False
         vx, vy = coordinates
 
-        obs = self.gen_obs()
-        obs_grid, _ = Grid.decode(obs['image'])
+        # Encode the view directly so that observation buffers are untouched
+        grid, vis_mask = self.gen_obs_grid()
+        obs_grid, _ = Grid.decode(grid.encode(vis_mask))
         obs_cell = obs_grid.get(vx, vy)
         world_cell = self.grid.get(x, y)
 
         return obs_cell is not None and obs_cell.type == world_cell.type
 
     def step(self, action):
+        self._materialize_obs()
+
         self.step_count += 1
 
         reward = 0
@@ -1182,6 +1794,7 @@ class MiniGridEnv(gym.Env):
         elif action == self.actions.toggle:
             if fwd_cell:
                 fwd_cell.toggle(self, fwd_pos)
+                self.grid._version += 1
 
         # Done action (not used by default)
         elif action == self.actions.done:
@@ -1193,10 +1806,61 @@ class MiniGridEnv(gym.Env):
         if self.step_count >= self.max_steps:
             done = True
 
+        if self._skip_obs:
+            return None, reward, done, {}
+
         obs = self.gen_obs()
 
         return obs, reward, done, {}
 
+    def step_no_obs(self, action):
+        """
+        Perform an action like step(), without generating the observation,
+        which is returned as None. Use observe() to get the observation of
+        the current state when it is needed. To go through wrappers, use
+        wrappers.step_no_obs() instead.
+        """
+
+        self._skip_obs = True
+        try:
+            return self.step(action)
+        finally:
+            self._skip_obs = False
+
+    def step_many(self, actions):
+        """
+        Perform a sequence of actions, stopping early at the end of the
+        episode, and only generate the observation after the last one.
+        The rewards are summed and info['num_steps'] is the number of
+        actions performed. To go through wrappers, use wrappers.step_many().
+        """
+
+        total_reward = 0
+        done = False
+        info = {}
+        num_steps = 0
+
+        self._skip_obs = True
+        try:
+            for action in actions:
+                _, reward, done, info = self.step(action)
+                total_reward += reward
+                num_steps += 1
+                if done:
+                    break
+        finally:
+            self._skip_obs = False
+
+        info = dict(info, num_steps=num_steps)
+        return self.gen_obs(), total_reward, done, info
+
+    def observe(self):
+        """
+        Generate the observation of the current state, e.g. after step_no_obs()
+        """
+
+        return self.gen_obs()
+
     def gen_obs_grid(self):
         """
         Generate the sub-grid observed by the agent.
@@ -1229,33 +1893,138 @@ class MiniGridEnv(gym.Env):
 
         return grid, vis_mask
 
+    def set_obs_buffers(self, image=None, direction=None):
+        """
+        Make the environment write its observations into caller-provided
+        buffers (e.g. a slot of a rollout storage array) instead of
+        allocating new arrays at every step. The observations returned by
+        reset() and step() then hold views of these buffers, and the same
+        observation dict is reused from one step to the next, so its
+        contents must be consumed or copied before stepping again.
+        Calling this method without arguments restores the default mode.
+
+        :param image: uint8 array of shape (view_size, view_size, 3)
+        :param direction: optional integer array of shape () or (1,)
+        """
+
+        if image is None:
+            assert direction is None, "a direction buffer requires an image buffer"
+            self.obs_buffers = None
+            return
+
+        view_shape = (self.agent_view_size, self.agent_view_size, 3)
+        assert image.shape == view_shape, image.shape
+        assert image.dtype == np.uint8, image.dtype
+        if direction is not None:
+            assert direction.size == 1, direction.shape
+
+        self.obs_buffers = {
+            'image': image,
+            'direction': direction,
+            'obs': {
+                'image': image,
+                'direction': direction,
+                'mission': None
+            }
+        }
+
     def gen_obs(self):
         """
         Generate the agent's view (partially observable, low-resolution encoding)
+
+        The image is generated when it is first read (see LazyObs), from
+        the state of the environment when gen_obs() was called. Methods
+        changing the state generate the image of the last observation
+        first, code changing the grid or the agent directly should call
+        _materialize_obs() beforehand. Otherwise, reading the image raises
+        a RuntimeError rather than showing the new state.
         """
 
-        grid, vis_mask = self.gen_obs_grid()
+        assert hasattr(self, 'mission'), "environments must define a textual mission string"
 
-        # Encode the partially observable view into a numpy array
-        image = grid.encode(vis_mask)
+        if self.obs_buffers is not None:
+            grid, vis_mask = self.gen_obs_grid()
+            return self._gen_obs_into_buffers(grid, vis_mask)
 
-        assert hasattr(self, 'mission'), "environments must define a textual mission string"
+        self._materialize_obs()
 
         # Observations are dictionaries containing:
         # - an image (partially observable view of the environment)
         # - the agent's direction/orientation (acting as a compass)
         # - a textual mission string (instructions for the agent)
-        obs = {
-            'image': image,
-            'direction': self.agent_dir,
-            'mission': self.mission
-        }
+        state = self._obs_state()
+
+        def gen_image():
+            # The state the observation was made in can't be recovered
+            if self._obs_state() != state:
+                raise RuntimeError(
+                    'the grid or the agent changed before the image of the '
+                    'observation was read, call _materialize_obs() before '
+                    'changing them directly'
+                )
+            return self._gen_obs_image()
+
+        obs = LazyObs(
+            gen_image,
+            direction=self.agent_dir,
+            mission=self.mission
+        )
+        self._last_obs = weakref.ref(obs)
 
         return obs
 
-    def get_obs_render(self, obs, tile_size=TILE_PIXELS//2):
+    def _obs_state(self):
+        """
+        State which the image of an observation depends on
+        """
+
+        grid = self.grid
+        return (grid, grid._version, tuple(self.agent_pos), self.agent_dir, self.carrying)
+
+    def _gen_obs_image(self):
+        # Encode the partially observable view into a numpy array
+        grid, vis_mask = self.gen_obs_grid()
+        return grid.encode(vis_mask)
+
+    def _materialize_obs(self):
+        """
+        Generate the image of the last observation, if it is still in use
+        and its image wasn't generated yet, before the state changes
+        """
+
+        if self._last_obs is not None:
+            obs = self._last_obs()
+            if obs is not None:
+                obs.materialize()
+
+    def __getstate__(self):
+        # Weak references can't be copied
+        state = self.__dict__.copy()
+        state.pop('_last_obs', None)
+        return state
+
+    def _gen_obs_into_buffers(self, grid, vis_mask):
+        """
+        Encode an observation into the buffers set by set_obs_buffers()
+        """
+
+        buffers = self.obs_buffers
+        grid.encode(vis_mask, out=buffers['image'])
+
+        obs = buffers['obs']
+        if buffers['direction'] is not None:
+            buffers['direction'][...] = self.agent_dir
+        else:
+            obs['direction'] = self.agent_dir
+        obs['mission'] = self.mission
+
+        return obs
+
+    def get_obs_render(self, obs, tile_size=TILE_PIXELS//2, out=None):
         """
         Render an agent observation for visualization
+
+        :param out: optional array to render into, see Grid.render()
         """
 
         grid, vis_mask = Grid.decode(obs)
@@ -1265,7 +2034,8 @@ class MiniGridEnv(gym.Env):
             tile_size,
             agent_pos=(self.agent_view_size // 2, self.agent_view_size - 1),
             agent_dir=3,
-            highlight_mask=vis_mask
+            highlight_mask=vis_mask,
+            out=out
         )
 
         return img
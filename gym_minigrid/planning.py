@@ -0,0 +1,455 @@
+import heapq
+from collections import deque
+
+import numpy as np
+
+from gym_minigrid.minigrid import OBJECT_TO_IDX, STATE_TO_IDX, DIR_TO_VEC
+
+# Types of objects the agent can walk over without ending the episode
+PASSABLE_TYPES = [
+    OBJECT_TO_IDX['empty'],
+    OBJECT_TO_IDX['floor'],
+    OBJECT_TO_IDX['goal'],
+    OBJECT_TO_IDX['sand'],
+]
+
+def passable_mask(array):
+    """
+    Boolean mask of the cells of an encoded grid (see Grid.encode), or of
+    a batch of encoded grids, which the agent can move to. Lava ends the
+    episode, so it is not passable, and neither are closed doors.
+    """
+
+    types = array[..., 0]
+    mask = np.isin(types, PASSABLE_TYPES)
+    mask |= (types == OBJECT_TO_IDX['door']) & (array[..., 2] == STATE_TO_IDX['open'])
+    return mask
+
+def closed_door_mask(array):
+    """
+    Boolean mask of the closed doors of an encoded grid which the agent
+    can open without a key
+    """
+
+    return (array[..., 0] == OBJECT_TO_IDX['door']) & (array[..., 2] == STATE_TO_IDX['closed'])
+
+def is_passable(obj):
+    """
+    Whether the agent can move to a cell holding a given object,
+    consistently with passable_mask()
+    """
+
+    return obj is None or (obj.can_overlap() and obj.type != 'lava')
+
+def goal_mask(array):
+    """
+    Boolean mask of the goal cells of an encoded grid, or of a batch of
+    encoded grids
+    """
+
+    return array[..., 0] == OBJECT_TO_IDX['goal']
+
+def shortest_path_length(array, start_pos, start_dir, goals=None):
+    """
+    Length of the shortest sequence of left, right and forward actions
+    taking the agent from a start pose to a goal of an encoded grid,
+    found by breadth-first search over (x, y, direction) states.
+    Returns None if no goal can be reached.
+
+    :param goals: boolean mask of the goal cells, all the goal objects
+        of the grid by default
+    """
+
+    width, height = array.shape[:2]
+
+    if goals is None:
+        goals = goal_mask(array)
+
+    # Cells are indexed by j * width + i, like in Grid
+    passable = passable_mask(array).T.ravel().tolist()
+    goals = goals.T.ravel().tolist()
+    vecs = [(int(dx), int(dy)) for dx, dy in DIR_TO_VEC]
+
+    start = start_pos[1] * width + start_pos[0]
+    if goals[start]:
+        return 0
+
+    # States are indexed by cell * 4 + direction
+    visited = bytearray(width * height * 4)
+    state = start * 4 + start_dir
+    visited[state] = 1
+    queue = deque([(state, 0)])
+
+    while queue:
+        state, dist = queue.popleft()
+        cell, dir = divmod(state, 4)
+        dist += 1
+
+        # Turn left, turn right
+        for next_state in (cell * 4 + (dir - 1) % 4, cell * 4 + (dir + 1) % 4):
+            if not visited[next_state]:
+                visited[next_state] = 1
+                queue.append((next_state, dist))
+
+        # Move forward, unless the grid ends there
+        dx, dy = vecs[dir]
+        x = cell % width + dx
+        y = cell // width + dy
+        if not (0 <= x < width and 0 <= y < height):
+            continue
+        next_cell = y * width + x
+        if not passable[next_cell]:
+            continue
+        if goals[next_cell]:
+            return dist
+        next_state = next_cell * 4 + dir
+        if not visited[next_state]:
+            visited[next_state] = 1
+            queue.append((next_state, dist))
+
+    return None
+
+def _shift(array, dx, dy):
+    """
+    Shift a (K, width, height) array by (dx, dy) cells, filling with False
+    """
+
+    out = np.zeros_like(array)
+    width, height = array.shape[1:]
+    out[:, max(dx, 0):width + min(dx, 0), max(dy, 0):height + min(dy, 0)] = \
+        array[:, max(-dx, 0):width - max(dx, 0), max(-dy, 0):height - max(dy, 0)]
+    return out
+
+def batch_shortest_path_lengths(passable, goals, start_pos, start_dir):
+    """
+    Shortest path lengths, as computed by shortest_path_length(), for a
+    batch of K grids. The breadth-first searches run together on
+    (K, width, height, direction) arrays.
+
+    :param passable: boolean (K, width, height) array, see passable_mask()
+    :param goals: boolean (K, width, height) array of the goal cells
+    :param start_pos: (K, 2) array of start positions
+    :param start_dir: (K,) array of start directions
+    :return: (K,) array of path lengths, -1 where no goal can be reached
+    """
+
+    num_grids = passable.shape[0]
+    batch = np.arange(num_grids)
+    start_pos = np.asarray(start_pos)
+    start_dir = np.asarray(start_dir)
+
+    frontier = np.zeros(passable.shape + (4,), dtype=bool)
+    frontier[batch, start_pos[:, 0], start_pos[:, 1], start_dir] = True
+    visited = frontier.copy()
+
+    lengths = np.full(num_grids, -1)
+    lengths[goals[batch, start_pos[:, 0], start_pos[:, 1]]] = 0
+    active = lengths < 0
+    frontier[~active] = False
+
+    dist = 0
+    while frontier.any():
+        dist += 1
+
+        # Turn left, turn right
+        reached = np.roll(frontier, 1, axis=3) | np.roll(frontier, -1, axis=3)
+
+        # Move forward
+        for dir, (dx, dy) in enumerate(DIR_TO_VEC):
+            reached[..., dir] |= _shift(frontier[..., dir], int(dx), int(dy)) & passable
+
+        frontier = reached & ~visited
+        visited |= frontier
+
+        at_goal = (frontier.any(axis=3) & goals).any(axis=(1, 2)) & active
+        lengths[at_goal] = dist
+        active &= ~at_goal
+        frontier[~active] = False
+
+    return lengths
+
+def goal_distance_field(passable, goals, closed_doors=None):
+    """
+    Minimum number of left, right, forward and toggle actions taking the
+    agent from each pose to a goal, found by a breadth-first search
+    backwards from the goals. Without closed doors, the lengths are those
+    computed by shortest_path_length() for every start pose at once.
+
+    :param passable: boolean (width, height) mask, see passable_mask()
+    :param goals: boolean (width, height) mask of the goal cells
+    :param closed_doors: optional boolean (width, height) mask of the
+        closed doors the agent can open, see closed_door_mask(). Moving
+        into one of them costs an extra action to open it.
+    :return: (width, height, 4) array indexed by position and direction,
+        -1 where no goal can be reached
+    """
+
+    if closed_doors is None:
+        closed_doors = np.zeros_like(passable)
+
+    dist = np.full(passable.shape + (4,), -1, dtype=np.int32)
+    frontier = np.repeat(goals[:, :, None], 4, axis=2)
+    dist[frontier] = 0
+    visited = frontier.copy()
+
+    # The agent never stands on a cell it can't move to
+    allowed = (passable | closed_doors)[:, :, None]
+    doors = closed_doors[:, :, None]
+
+    # Poses reached one and two actions after the current frontier
+    next_frontier = np.zeros_like(frontier)
+    later_frontier = np.zeros_like(frontier)
+
+    steps = 0
+    while frontier.any() or next_frontier.any() or later_frontier.any():
+        # Poses from which turning left or right gets to the frontier
+        next_frontier |= np.roll(frontier, 1, axis=2) | np.roll(frontier, -1, axis=2)
+
+        # Poses from which moving forward gets to the frontier, with an
+        # extra action to open the door when moving into a closed door
+        for dir, (dx, dy) in enumerate(DIR_TO_VEC):
+            into_door = frontier[..., dir] & doors[..., 0]
+            next_frontier[..., dir] |= _shift((frontier[..., dir] & ~into_door)[None], -int(dx), -int(dy))[0]
+            later_frontier[..., dir] |= _shift(into_door[None], -int(dx), -int(dy))[0]
+
+        steps += 1
+        frontier = next_frontier & allowed & ~visited
+        next_frontier = later_frontier
+        later_frontier = np.zeros_like(frontier)
+        visited |= frontier
+        dist[frontier] = steps
+
+    return dist
+
+def _view_top_left(agent_pos, agent_dir, view_size):
+    """
+    Top-left corner of the square of cells visible to an agent, as
+    computed by MiniGridEnv.get_view_exts(). Works on arrays of poses.
+    """
+
+    half = view_size // 2
+    offset_x = np.array([0, -half, 1 - view_size, -half])[agent_dir]
+    offset_y = np.array([-half, 0, -half, 1 - view_size])[agent_dir]
+    agent_pos = np.asarray(agent_pos)
+    return agent_pos[..., 0] + offset_x, agent_pos[..., 1] + offset_y
+
+def in_view_square(agent_pos, agent_dir, view_size, pos):
+    """
+    Whether a position is in the square of cells visible to an agent
+    with a given pose, like MiniGridEnv.in_view(), without setting the
+    pose of an environment
+    """
+
+    top_x, top_y = _view_top_left(agent_pos, agent_dir, view_size)
+    return bool(
+        top_x <= pos[0] < top_x + view_size and
+        top_y <= pos[1] < top_y + view_size
+    )
+
+def batch_view_masks(width, height, agent_pos, agent_dir, view_size):
+    """
+    Boolean (K, width, height) masks of the squares of cells visible
+    to K agents with the given poses
+    """
+
+    top_x, top_y = _view_top_left(agent_pos, np.asarray(agent_dir), view_size)
+    rel_x = np.arange(width)[None, :, None] - top_x[:, None, None]
+    rel_y = np.arange(height)[None, None, :] - top_y[:, None, None]
+    return (rel_x >= 0) & (rel_x < view_size) & (rel_y >= 0) & (rel_y < view_size)
+
+def view_footprint(width, height, pos, view_size):
+    """
+    Boolean (width, height, 4) mask of the agent poses, indexed by
+    position and direction, from which a position is in the square of
+    cells visible to the agent, see in_view_square()
+    """
+
+    poses = np.stack(np.meshgrid(np.arange(width), np.arange(height), indexing='ij'), axis=-1)
+    top_x, top_y = _view_top_left(poses[:, :, None, :], np.arange(4), view_size)
+    return (top_x <= pos[0]) & (pos[0] < top_x + view_size) & \
+        (top_y <= pos[1]) & (pos[1] < top_y + view_size)
+
+# Distance of the states which can't be reached
+UNREACHABLE = 1 << 30
+
+class ReachabilityTracker:
+    """
+    Minimum number of left, right and forward actions taking the agent from
+    a start pose to each (x, y, direction) state of a grid. The distances
+    are updated incrementally when a cell becomes passable or blocked,
+    which only costs work around the states whose distance changes.
+    """
+
+    def __init__(self, passable, start_pos, start_dir):
+        """
+        :param passable: boolean (width, height) mask of the passable
+            cells, see passable_mask()
+        """
+
+        self.width, self.height = passable.shape
+        self.start_pos = tuple(start_pos)
+        self.start_dir = start_dir
+
+        # Cells are indexed by j * width + i, states by cell * 4 + direction
+        self.passable = passable.T.ravel().tolist()
+        self.vecs = [(int(dx), int(dy)) for dx, dy in DIR_TO_VEC]
+        self.start_state = (start_pos[1] * self.width + start_pos[0]) * 4 + start_dir
+
+        self.recompute()
+
+    def recompute(self):
+        """
+        Compute all the distances with a breadth-first search
+        """
+
+        dist = [UNREACHABLE] * (self.width * self.height * 4)
+        dist[self.start_state] = 0
+        queue = deque([self.start_state])
+
+        while queue:
+            state = queue.popleft()
+            next_dist = dist[state] + 1
+            for next_state in self._successors(state):
+                if dist[next_state] == UNREACHABLE:
+                    dist[next_state] = next_dist
+                    queue.append(next_state)
+
+        self.dist = dist
+
+    def _forward_cell(self, cell, dir, sign=1):
+        """
+        Cell in front of (sign=1) or behind (sign=-1) a cell,
+        or None if it is out of the grid
+        """
+
+        dx, dy = self.vecs[dir]
+        x = cell % self.width + sign * dx
+        y = cell // self.width + sign * dy
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return None
+
+    def _successors(self, state):
+        cell, dir = divmod(state, 4)
+        yield cell * 4 + (dir - 1) % 4
+        yield cell * 4 + (dir + 1) % 4
+        next_cell = self._forward_cell(cell, dir)
+        if next_cell is not None and self.passable[next_cell]:
+            yield next_cell * 4 + dir
+
+    def _predecessors(self, state):
+        # Like _successors, only the cell moved into has to be passable,
+        # the agent can leave its start cell after it was blocked
+        cell, dir = divmod(state, 4)
+        yield cell * 4 + (dir + 1) % 4
+        yield cell * 4 + (dir - 1) % 4
+        prev_cell = self._forward_cell(cell, dir, -1)
+        if prev_cell is not None and self.passable[cell]:
+            yield prev_cell * 4 + dir
+
+    def _relax(self, heap):
+        """
+        Propagate decreased distances from the states in a heap
+        of (distance, state) pairs
+        """
+
+        dist = self.dist
+
+        while heap:
+            state_dist, state = heapq.heappop(heap)
+            if state_dist > dist[state]:
+                continue
+            for next_state in self._successors(state):
+                if state_dist + 1 < dist[next_state]:
+                    dist[next_state] = state_dist + 1
+                    heapq.heappush(heap, (state_dist + 1, next_state))
+
+    def set_passable(self, x, y, passable):
+        """
+        Update the distances after the cell at (x, y) became passable or blocked
+        """
+
+        cell = y * self.width + x
+        if self.passable[cell] == passable:
+            return
+        self.passable[cell] = passable
+
+        dist = self.dist
+        states = range(cell * 4, cell * 4 + 4)
+
+        # Blocking the start cell leaves the agent where it is
+        if self.start_state in states:
+            self.recompute()
+            return
+
+        if passable:
+            # The states of the cell can be entered from the cells around
+            heap = []
+            for state in states:
+                for prev_state in self._predecessors(state):
+                    if dist[prev_state] + 1 < dist[state]:
+                        dist[state] = dist[prev_state] + 1
+                if dist[state] < UNREACHABLE:
+                    heap.append((dist[state], state))
+            heapq.heapify(heap)
+            self._relax(heap)
+            return
+
+        # Find the states whose shortest paths all went through the cell,
+        # in increasing order of distance, so that the predecessors of a
+        # state are classified before the state itself
+        affected = set(state for state in states if dist[state] < UNREACHABLE)
+        heap = []
+        for state in affected:
+            for next_state in self._successors(state):
+                if dist[next_state] == dist[state] + 1:
+                    heapq.heappush(heap, (dist[next_state], next_state))
+
+        while heap:
+            state_dist, state = heapq.heappop(heap)
+            if state in affected:
+                continue
+            supported = any(
+                dist[prev_state] + 1 == state_dist and prev_state not in affected
+                for prev_state in self._predecessors(state)
+            )
+            if supported:
+                continue
+            affected.add(state)
+            for next_state in self._successors(state):
+                if dist[next_state] == state_dist + 1:
+                    heapq.heappush(heap, (dist[next_state], next_state))
+
+        # Recompute the distances of the affected states from the others
+        for state in affected:
+            dist[state] = UNREACHABLE
+        heap = []
+        for state in affected:
+            if state // 4 == cell:
+                continue
+            best = min(dist[prev_state] for prev_state in self._predecessors(state)) + 1
+            if best < UNREACHABLE:
+                dist[state] = best
+                heap.append((best, state))
+        heapq.heapify(heap)
+        self._relax(heap)
+
+    def distance(self, x, y):
+        """
+        Minimum number of actions to get to the cell at (x, y),
+        or None if it can't be reached
+        """
+
+        cell = y * self.width + x
+        best = min(self.dist[cell * 4:cell * 4 + 4])
+        return None if best >= UNREACHABLE else best
+
+    def goal_distance(self, goal_positions):
+        """
+        Minimum number of actions to get to any of the given positions,
+        or None if none can be reached
+        """
+
+        dists = [self.distance(x, y) for x, y in goal_positions]
+        dists = [d for d in dists if d is not None]
+        return min(dists) if dists else None
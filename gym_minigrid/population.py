@@ -0,0 +1,244 @@
+import collections
+import multiprocessing as mp
+
+import numpy as np
+
+from gym_minigrid.envs.dynamic_minigrid import DynamicMiniGrid, AlterationJournal
+from gym_minigrid.minigrid import Grid
+from gym_minigrid.vec_env import SharedArrays
+
+# Environment of each worker process of a LevelPopulation, into which
+# the levels are loaded from shared memory
+_worker_env = None
+_worker_shared = None
+
+def _init_worker(shm_name, specs, env_kwargs):
+    global _worker_env, _worker_shared
+
+    _worker_shared = SharedArrays(specs, name=shm_name)
+    _worker_env = DynamicMiniGrid(**env_kwargs)
+
+def load_level(env, shared, idx):
+    """
+    Load a level of a population into a DynamicMiniGrid
+    """
+
+    # Generate the image of the last observation before replacing the level
+    env._materialize_obs()
+    env.grid, _ = Grid.decode(shared['grid'][idx])
+    env.goal_pos = env._find_goal()
+    env.agent_start_pos = tuple(int(x) for x in shared['start_pos'][idx])
+    env.agent_start_dir = int(shared['start_dir'][idx])
+    env.journal = AlterationJournal()
+    return env.respawn()
+
+def store_level(env, shared, idx):
+    """
+    Store the level of a DynamicMiniGrid in a population
+    """
+
+    env.grid.encode(out=shared['grid'][idx])
+    shared['start_pos'][idx] = env.agent_start_pos
+    shared['start_dir'][idx] = env.agent_start_dir
+
+def _alter_task(args):
+    src, dst, seed, prob_dict, num_alterations, visibility_check = args
+    env = _worker_env
+
+    load_level(env, _worker_shared, src)
+    env.seed(seed)
+    for _ in range(num_alterations):
+        env.alter(prob_dict, visibility_check)
+    store_level(env, _worker_shared, dst)
+
+    solvable, steps = env.check_solvable()
+    return solvable, -1 if steps is None else steps
+
+def _evaluate_task(args):
+    policy, tasks, num_episodes = args
+    env = _worker_env
+
+    returns = []
+    for idx, seed in tasks:
+        env.seed(seed)
+        total = 0
+        for _ in range(num_episodes):
+            obs = load_level(env, _worker_shared, idx)
+            done = False
+            while not done:
+                obs, reward, done, _ = env.step(policy(obs))
+                total += reward
+        returns.append(total / num_episodes)
+
+    return returns
+
+class LevelPopulation:
+    """
+    Population of DynamicMiniGrid levels, stored as grid encodings and
+    agent start poses in shared memory. Alterations and evaluation
+    rollouts are run by a pool of worker processes, which load the
+    levels they are given from shared memory and write the altered
+    levels back, so that only indices, seeds and scores are sent
+    between processes.
+    """
+
+    def __init__(
+        self,
+        num_levels,
+        num_workers=None,
+        seed=0,
+        context=None,
+        **env_kwargs
+    ):
+        """
+        :param num_levels: number of levels in the population
+        :param num_workers: number of worker processes, defaults to the number of CPUs
+        :param seed: seed of the random number generator drawing the
+            seeds of the alterations and rollouts
+        :param context: multiprocessing start method
+        :param env_kwargs: arguments of DynamicMiniGrid, e.g. size
+        """
+
+        # All the levels start as the level of a new environment
+        template = DynamicMiniGrid(**env_kwargs)
+        self.env_kwargs = env_kwargs
+        self.num_levels = num_levels
+        self.width = template.width
+        self.height = template.height
+
+        self.specs = [
+            ('grid', (num_levels, self.width, self.height, 3), np.uint8),
+            ('start_pos', (num_levels, 2), np.int64),
+            ('start_dir', (num_levels,), np.int64),
+        ]
+        self.shared = SharedArrays(self.specs)
+        for idx in range(num_levels):
+            store_level(template, self.shared, idx)
+        template.close()
+
+        self.rng = np.random.default_rng(seed)
+
+        if num_workers is None:
+            num_workers = mp.cpu_count()
+        self.num_workers = num_workers
+
+        ctx = mp.get_context(context)
+        self.pool = ctx.Pool(
+            num_workers,
+            initializer=_init_worker,
+            initargs=(self.shared.name, self.specs, env_kwargs)
+        )
+
+        self.closed = False
+
+    def __len__(self):
+        return self.num_levels
+
+    def _seeds(self, num):
+        return self.rng.integers(0, 2 ** 31, size=num).tolist()
+
+    def alter(
+        self,
+        prob_dict,
+        src_indices,
+        dst_indices=None,
+        num_alterations=1,
+        visibility_check=True,
+        chunksize=8
+    ):
+        """
+        Alter levels in the worker processes, see DynamicMiniGrid.alter()
+
+        :param src_indices: indices of the levels to alter
+        :param dst_indices: indices where the altered levels are stored,
+            the levels are altered in place by default. Each index should
+            appear at most once, and can only be a source index of the
+            same alteration.
+        :param num_alterations: number of alterations applied to each level
+        :return: tuple of arrays (solvable, steps), see DynamicMiniGrid.check_solvable().
+            steps is -1 for the levels which can't be solved.
+        """
+
+        src_indices = [int(idx) for idx in src_indices]
+        if dst_indices is None:
+            dst_indices = src_indices
+        dst_indices = [int(idx) for idx in dst_indices]
+        assert len(src_indices) == len(dst_indices)
+
+        # The tasks run concurrently, so a level can't be overwritten
+        # while another task may still be reading it
+        src_counts = collections.Counter(src_indices)
+        if len(set(dst_indices)) != len(dst_indices):
+            raise ValueError('each destination index should appear at most once')
+        for src, dst in zip(src_indices, dst_indices):
+            if src_counts[dst] > int(src == dst):
+                raise ValueError(
+                    'level %d is both the destination and the source of '
+                    'different alterations' % dst
+                )
+
+        tasks = [
+            (src, dst, seed, prob_dict, num_alterations, visibility_check)
+            for src, dst, seed in zip(src_indices, dst_indices, self._seeds(len(src_indices)))
+        ]
+        results = self.pool.map(_alter_task, tasks, chunksize)
+
+        solvable = np.array([r[0] for r in results], dtype=bool)
+        steps = np.array([r[1] for r in results], dtype=np.int64)
+        return solvable, steps
+
+    def evaluate(self, policy, indices=None, num_episodes=1, chunksize=8):
+        """
+        Score levels with the mean return of rollouts of a policy, run in
+        the worker processes
+
+        :param policy: picklable callable mapping an observation to an
+            action, e.g. a module-level function or an object holding
+            the weights of a model. It is sent once per chunk of levels.
+        :param indices: indices of the levels to evaluate, all by default
+        :return: array of mean returns, one per level
+        """
+
+        if indices is None:
+            indices = range(self.num_levels)
+        indices = [int(idx) for idx in indices]
+
+        tasks = list(zip(indices, self._seeds(len(indices))))
+        chunks = [
+            (policy, tasks[i:i + chunksize], num_episodes)
+            for i in range(0, len(tasks), chunksize)
+        ]
+
+        scores = []
+        for chunk_scores in self.pool.map(_evaluate_task, chunks):
+            scores.extend(chunk_scores)
+        return np.array(scores, dtype=np.float64)
+
+    def get_env(self, idx):
+        """
+        Create an environment in the current process with a level of the population
+        """
+
+        env = DynamicMiniGrid(**self.env_kwargs)
+        load_level(env, self.shared, idx)
+        return env
+
+    def set_level(self, idx, env):
+        """
+        Store the level of an environment in the population
+        """
+
+        store_level(env, self.shared, idx)
+
+    def close(self):
+        if self.closed:
+            return
+
+        self.pool.close()
+        self.pool.join()
+        self.shared.close()
+        self.closed = True
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close()
@@ -19,3 +19,134 @@ def register(
 
     # Add the environment to the set
     env_list.append(id)
+
+# Environments defined in each module of gym_minigrid.envs, as
+# (environment id, class name) pairs. Registering them doesn't import
+# their modules, which gym.make imports when making one of them.
+ENV_TABLE = [
+    ('empty', [
+        ('MiniGrid-Empty-5x5-v0', 'EmptyEnv5x5'),
+        ('MiniGrid-Empty-Random-5x5-v0', 'EmptyRandomEnv5x5'),
+        ('MiniGrid-Empty-6x6-v0', 'EmptyEnv6x6'),
+        ('MiniGrid-Empty-Random-6x6-v0', 'EmptyRandomEnv6x6'),
+        ('MiniGrid-Empty-8x8-v0', 'EmptyEnv'),
+        ('MiniGrid-Empty-16x16-v0', 'EmptyEnv16x16'),
+    ]),
+    ('doorkey', [
+        ('MiniGrid-DoorKey-5x5-v0', 'DoorKeyEnv5x5'),
+        ('MiniGrid-DoorKey-6x6-v0', 'DoorKeyEnv6x6'),
+        ('MiniGrid-DoorKey-8x8-v0', 'DoorKeyEnv'),
+        ('MiniGrid-DoorKey-16x16-v0', 'DoorKeyEnv16x16'),
+    ]),
+    ('multiroom', [
+        ('MiniGrid-MultiRoom-N2-S4-v0', 'MultiRoomEnvN2S4'),
+        ('MiniGrid-MultiRoom-N4-S5-v0', 'MultiRoomEnvN4S5'),
+        ('MiniGrid-MultiRoom-N6-v0', 'MultiRoomEnvN6'),
+    ]),
+    ('fetch', [
+        ('MiniGrid-Fetch-5x5-N2-v0', 'FetchEnv5x5N2'),
+        ('MiniGrid-Fetch-6x6-N2-v0', 'FetchEnv6x6N2'),
+        ('MiniGrid-Fetch-8x8-N3-v0', 'FetchEnv'),
+    ]),
+    ('gotoobject', [
+        ('MiniGrid-GoToObject-6x6-N2-v0', 'GoToObjectEnv'),
+        ('MiniGrid-GoToObject-8x8-N2-v0', 'GotoEnv8x8N2'),
+    ]),
+    ('gotodoor', [
+        ('MiniGrid-GoToDoor-5x5-v0', 'GoToDoorEnv'),
+        ('MiniGrid-GoToDoor-6x6-v0', 'GoToDoor6x6Env'),
+        ('MiniGrid-GoToDoor-8x8-v0', 'GoToDoor8x8Env'),
+    ]),
+    ('putnear', [
+        ('MiniGrid-PutNear-6x6-N2-v0', 'PutNearEnv'),
+        ('MiniGrid-PutNear-8x8-N3-v0', 'PutNear8x8N3'),
+    ]),
+    ('lockedroom', [
+        ('MiniGrid-LockedRoom-v0', 'LockedRoom'),
+    ]),
+    ('keycorridor', [
+        ('MiniGrid-KeyCorridorS3R1-v0', 'KeyCorridorS3R1'),
+        ('MiniGrid-KeyCorridorS3R2-v0', 'KeyCorridorS3R2'),
+        ('MiniGrid-KeyCorridorS3R3-v0', 'KeyCorridorS3R3'),
+        ('MiniGrid-KeyCorridorS4R3-v0', 'KeyCorridorS4R3'),
+        ('MiniGrid-KeyCorridorS5R3-v0', 'KeyCorridorS5R3'),
+        ('MiniGrid-KeyCorridorS6R3-v0', 'KeyCorridorS6R3'),
+    ]),
+    ('unlock', [
+        ('MiniGrid-Unlock-v0', 'Unlock'),
+    ]),
+    ('unlockpickup', [
+        ('MiniGrid-UnlockPickup-v0', 'UnlockPickup'),
+    ]),
+    ('blockedunlockpickup', [
+        ('MiniGrid-BlockedUnlockPickup-v0', 'BlockedUnlockPickup'),
+    ]),
+    ('playground_v0', [
+        ('MiniGrid-Playground-v0', 'PlaygroundV0'),
+    ]),
+    ('redbluedoors', [
+        ('MiniGrid-RedBlueDoors-6x6-v0', 'RedBlueDoorEnv6x6'),
+        ('MiniGrid-RedBlueDoors-8x8-v0', 'RedBlueDoorEnv'),
+    ]),
+    ('obstructedmaze', [
+        ('MiniGrid-ObstructedMaze-1Dl-v0', 'ObstructedMaze_1Dl'),
+        ('MiniGrid-ObstructedMaze-1Dlh-v0', 'ObstructedMaze_1Dlh'),
+        ('MiniGrid-ObstructedMaze-1Dlhb-v0', 'ObstructedMaze_1Dlhb'),
+        ('MiniGrid-ObstructedMaze-2Dl-v0', 'ObstructedMaze_2Dl'),
+        ('MiniGrid-ObstructedMaze-2Dlh-v0', 'ObstructedMaze_2Dlh'),
+        ('MiniGrid-ObstructedMaze-2Dlhb-v0', 'ObstructedMaze_2Dlhb'),
+        ('MiniGrid-ObstructedMaze-1Q-v0', 'ObstructedMaze_1Q'),
+        ('MiniGrid-ObstructedMaze-2Q-v0', 'ObstructedMaze_2Q'),
+        ('MiniGrid-ObstructedMaze-Full-v0', 'ObstructedMaze_Full'),
+    ]),
+    ('memory', [
+        ('MiniGrid-MemoryS17Random-v0', 'MemoryS17Random'),
+        ('MiniGrid-MemoryS13Random-v0', 'MemoryS13Random'),
+        ('MiniGrid-MemoryS13-v0', 'MemoryS13'),
+        ('MiniGrid-MemoryS11-v0', 'MemoryS11'),
+        ('MiniGrid-MemoryS9-v0', 'MemoryS9'),
+        ('MiniGrid-MemoryS7-v0', 'MemoryS7'),
+    ]),
+    ('fourrooms', [
+        ('MiniGrid-FourRooms-v0', 'FourRoomsEnv'),
+    ]),
+    ('crossing', [
+        ('MiniGrid-LavaCrossingS9N1-v0', 'LavaCrossingEnv'),
+        ('MiniGrid-LavaCrossingS9N2-v0', 'LavaCrossingS9N2Env'),
+        ('MiniGrid-LavaCrossingS9N3-v0', 'LavaCrossingS9N3Env'),
+        ('MiniGrid-LavaCrossingS11N5-v0', 'LavaCrossingS11N5Env'),
+        ('MiniGrid-SimpleCrossingS9N1-v0', 'SimpleCrossingEnv'),
+        ('MiniGrid-SimpleCrossingS9N2-v0', 'SimpleCrossingS9N2Env'),
+        ('MiniGrid-SimpleCrossingS9N3-v0', 'SimpleCrossingS9N3Env'),
+        ('MiniGrid-SimpleCrossingS11N5-v0', 'SimpleCrossingS11N5Env'),
+    ]),
+    ('lavagap', [
+        ('MiniGrid-LavaGapS5-v0', 'LavaGapS5Env'),
+        ('MiniGrid-LavaGapS6-v0', 'LavaGapS6Env'),
+        ('MiniGrid-LavaGapS7-v0', 'LavaGapS7Env'),
+    ]),
+    ('dynamicobstacles', [
+        ('MiniGrid-Dynamic-Obstacles-5x5-v0', 'DynamicObstaclesEnv5x5'),
+        ('MiniGrid-Dynamic-Obstacles-Random-5x5-v0', 'DynamicObstaclesRandomEnv5x5'),
+        ('MiniGrid-Dynamic-Obstacles-6x6-v0', 'DynamicObstaclesEnv6x6'),
+        ('MiniGrid-Dynamic-Obstacles-Random-6x6-v0', 'DynamicObstaclesRandomEnv6x6'),
+        ('MiniGrid-Dynamic-Obstacles-8x8-v0', 'DynamicObstaclesEnv'),
+        ('MiniGrid-Dynamic-Obstacles-16x16-v0', 'DynamicObstaclesEnv16x16'),
+    ]),
+    ('distshift', [
+        ('MiniGrid-DistShift1-v0', 'DistShift1'),
+        ('MiniGrid-DistShift2-v0', 'DistShift2'),
+    ]),
+]
+
+def register_envs():
+    """
+    Register all the environments of ENV_TABLE
+    """
+
+    for module, envs in ENV_TABLE:
+        for env_id, class_name in envs:
+            register(
+                id=env_id,
+                entry_point='gym_minigrid.envs.%s:%s' % (module, class_name)
+            )
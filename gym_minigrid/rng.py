@@ -0,0 +1,207 @@
+import numpy as np
+from gym import error
+from gym.utils import seeding
+
+# Number of 64-bit values drawn at once by BlockRandom
+RNG_BLOCK_SIZE = 1024
+
+def _seed_sequence(seed):
+    """
+    Seed sequence for a seed, validated as in gym.utils.seeding
+    """
+
+    if seed is not None and not (isinstance(seed, int) and 0 <= seed):
+        raise error.Error(f"Seed must be a non-negative integer or omitted, not {seed}")
+
+    return np.random.SeedSequence(seed)
+
+# Methods of numpy generators counted as one draw each by CountingGenerator
+COUNTED_METHODS = [
+    'integers', 'random', 'uniform', 'normal', 'choice', 'shuffle', 'permutation',
+]
+
+class CountingGenerator(seeding.RandomNumberGenerator):
+    """
+    Numpy generator counting the calls which draw random numbers, so that
+    the draws environments make directly, e.g. self.np_random.shuffle(),
+    are counted along with the ones made through the random number service
+    """
+
+    num_calls = 0
+    _in_call = False
+
+    def __reduce__(self):
+        return (_make_counting_generator, (self.bit_generator.state, self.num_calls))
+
+def _make_counting_generator(state, num_calls):
+    bit_generator = np.random.PCG64()
+    bit_generator.state = state
+    gen = CountingGenerator(bit_generator)
+    gen.num_calls = num_calls
+    return gen
+
+def _counted(name):
+    method = getattr(seeding.RandomNumberGenerator, name)
+
+    def counted(self, *args, **kwargs):
+        # Some methods call others, e.g. choice() calls integers()
+        if self._in_call:
+            return method(self, *args, **kwargs)
+
+        self.num_calls += 1
+        self._in_call = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._in_call = False
+
+    counted.__name__ = name
+    counted.__doc__ = method.__doc__
+    return counted
+
+for _name in COUNTED_METHODS:
+    setattr(CountingGenerator, _name, _counted(_name))
+del _name
+
+class LegacyRandom:
+    """
+    Random number service drawing each number from the numpy generator
+    created by gym.utils.seeding, so that levels are generated exactly
+    as by previous versions for a given seed
+    """
+
+    def __init__(self, seed_seq):
+        self.seed_seq = seed_seq
+        self.np_random = CountingGenerator(np.random.PCG64(seed_seq))
+
+        # Draws not made through np_random
+        self._num_draws = 0
+
+    @property
+    def num_draws(self):
+        """
+        Number of random numbers drawn through this service or directly
+        from its numpy generator (each call of a generator method counts
+        as one draw, e.g. a shuffle)
+        """
+
+        return self._num_draws + self.np_random.num_calls
+
+    @num_draws.setter
+    def num_draws(self, value):
+        self._num_draws = value - self.np_random.num_calls
+
+    def spawn(self, num_streams):
+        """
+        Create independent child streams of the same type
+        """
+
+        return [type(self)(seq) for seq in self.seed_seq.spawn(num_streams)]
+
+    def get_state(self):
+        return self.np_random.bit_generator.state
+
+    def set_state(self, state):
+        self.np_random.bit_generator.state = state
+
+    def integers(self, low, high):
+        """
+        Generate random integer in [low,high[
+        """
+
+        return self.np_random.integers(low, high)
+
+    def uniform(self, low, high):
+        """
+        Generate random float in [low,high[
+        """
+
+        return self.np_random.uniform(low, high)
+
+    def subset(self, lst, num_elems):
+        """
+        Pick num_elems distinct elements of a list, in random order.
+        Removes them from the list.
+        """
+
+        return [lst.pop(self.integers(0, len(lst))) for _ in range(num_elems)]
+
+class BlockRandom(LegacyRandom):
+    """
+    Random number service serving draws from a block of 64-bit values
+    generated at once, which avoids the overhead of a numpy call per draw.
+    Draws don't match the ones of LegacyRandom for the same seed.
+    """
+
+    def __init__(self, seed_seq, block_size=RNG_BLOCK_SIZE):
+        super().__init__(seed_seq)
+        self.block_size = block_size
+        self._fill()
+
+    def spawn(self, num_streams):
+        return [
+            type(self)(seq, self.block_size)
+            for seq in self.seed_seq.spawn(num_streams)
+        ]
+
+    def _fill(self):
+        # Remember the generator state the block was drawn from, so that
+        # the block can be drawn again when restoring a state
+        self._block_state = self.np_random.bit_generator.state
+        self._block = self.np_random.bit_generator.random_raw(self.block_size).tolist()
+        self._pos = 0
+
+    def _next(self):
+        pos = self._pos
+        if pos == self.block_size:
+            self._fill()
+            pos = 0
+        self._pos = pos + 1
+        self._num_draws += 1
+        return self._block[pos]
+
+    def get_state(self):
+        return (self._block_state, self._pos, self.np_random.bit_generator.state)
+
+    def set_state(self, state):
+        block_state, pos, state = state
+        self.np_random.bit_generator.state = block_state
+        self._fill()
+        self._pos = pos
+        self.np_random.bit_generator.state = state
+
+    def integers(self, low, high):
+        assert high > low
+        return low + ((self._next() * (high - low)) >> 64)
+
+    def uniform(self, low, high):
+        return low + (high - low) * ((self._next() >> 11) * (1.0 / 9007199254740992))
+
+    def subset(self, lst, num_elems):
+        # Partial Fisher-Yates shuffle
+        num = len(lst)
+        for i in range(num_elems):
+            j = self.integers(i, num)
+            lst[i], lst[j] = lst[j], lst[i]
+        out = lst[:num_elems]
+        del lst[:num_elems]
+        return out
+
+# Random number services by mode name
+RNG_MODES = {
+    'legacy': LegacyRandom,
+    'block': BlockRandom,
+}
+
+def make_rng(seed=None, mode='legacy'):
+    """
+    Create a random number service for a seed
+
+    :param mode: 'legacy' reproduces the levels generated by previous
+        versions for a given seed, 'block' draws numbers faster
+    """
+
+    if mode not in RNG_MODES:
+        raise ValueError('unknown random number generator mode: %s' % mode)
+
+    return RNG_MODES[mode](_seed_sequence(seed))
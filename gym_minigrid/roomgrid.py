@@ -66,6 +66,9 @@ class RoomGrid(MiniGridEnv):
     This is meant to serve as a base class for other environments.
     """
 
+    # Attributes of the level set by _gen_grid, see MiniGridEnv.level_state_attrs
+    level_state_attrs = ('room_grid', 'room_set_parent', 'num_room_sets')
+
     def __init__(
         self,
         room_size=7,
@@ -140,6 +143,11 @@ class RoomGrid(MiniGridEnv):
 
             self.room_grid.append(row)
 
+        # Disjoint sets of rooms connected by doors or removed walls,
+        # indexed by j * num_cols + i
+        self.room_set_parent = list(range(self.num_rows * self.num_cols))
+        self.num_room_sets = self.num_rows * self.num_cols
+
         # For each row of rooms
         for j in range(0, self.num_rows):
             # For each column of rooms
@@ -170,6 +178,34 @@ class RoomGrid(MiniGridEnv):
         )
         self.agent_dir = 0
 
+    def _room_set(self, room):
+        """
+        Find the representative of the set of rooms connected to a room
+        """
+
+        i = room.top[0] // (self.room_size-1)
+        j = room.top[1] // (self.room_size-1)
+        idx = j * self.num_cols + i
+
+        parent = self.room_set_parent
+        while parent[idx] != idx:
+            # Path halving
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+
+        return idx
+
+    def _connect_rooms(self, room, neighbor):
+        """
+        Merge the sets of rooms connected to two adjacent rooms
+        """
+
+        a = self._room_set(room)
+        b = self._room_set(neighbor)
+        if a != b:
+            self.room_set_parent[a] = b
+            self.num_room_sets -= 1
+
     def place_in_room(self, i, j, obj):
         """
         Add an existing object to room (i, j)
@@ -225,6 +261,7 @@ class RoomGrid(MiniGridEnv):
                 door_idx = self._rand_int(0, 4)
                 if room.neighbors[door_idx] and room.doors[door_idx] is None:
                     break
+                self._gen_retry()
 
         if color == None:
             color = self._rand_color()
@@ -244,6 +281,7 @@ class RoomGrid(MiniGridEnv):
         neighbor = room.neighbors[door_idx]
         room.doors[door_idx] = door
         neighbor.doors[(door_idx+2) % 4] = door
+        self._connect_rooms(room, neighbor)
 
         return door, pos
 
@@ -282,6 +320,7 @@ class RoomGrid(MiniGridEnv):
         # Mark the rooms as connected
         room.doors[wall_idx] = True
         neighbor.doors[(wall_idx+2) % 4] = True
+        self._connect_rooms(room, neighbor)
 
     def place_agent(self, i=None, j=None, rand_dir=True):
         """
@@ -301,6 +340,7 @@ class RoomGrid(MiniGridEnv):
             front_cell = self.grid.get(*self.front_pos)
             if front_cell is None or front_cell.type is 'wall':
                 break
+            self._gen_retry()
 
         return self.agent_pos
 
@@ -310,50 +350,40 @@ class RoomGrid(MiniGridEnv):
         starting position
         """
 
-        start_room = self.room_from_pos(*self.agent_pos)
-
         added_doors = []
 
-        def find_reach():
-            reach = set()
-            stack = [start_room]
-            while len(stack) > 0:
-                room = stack.pop()
-                if room in reach:
-                    continue
-                reach.add(room)
-                for i in range(0, 4):
-                    if room.doors[i]:
-                        stack.append(room.neighbors[i])
-            return reach
-
         num_itrs = 0
 
-        while True:
-            # This is to handle rare situations where random sampling produces
-            # a level that cannot be connected, producing in an infinite loop
+        # Each door merges two sets of connected rooms, so this loop
+        # runs at most num_rows * num_cols - 1 times
+        while self.num_room_sets > 1:
             if num_itrs > max_itrs:
                 raise RecursionError('connect_all failed')
             num_itrs += 1
 
-            # If all rooms are reachable, stop
-            reach = find_reach()
-            if len(reach) == self.num_rows * self.num_cols:
-                break
-
-            # Pick a random room and door position
-            i = self._rand_int(0, self.num_cols)
-            j = self._rand_int(0, self.num_rows)
-            k = self._rand_int(0, 4)
-            room = self.get_room(i, j)
-
-            # If there is already a door there, skip
-            if not room.door_pos[k] or room.doors[k]:
-                continue
-
-            if room.locked or room.neighbors[k].locked:
-                continue
+            # Collect the walls where a door would connect two sets of rooms.
+            # Only the right and bottom walls of each room are considered,
+            # so that every wall is counted once
+            candidates = []
+            for j in range(0, self.num_rows):
+                for i in range(0, self.num_cols):
+                    room = self.get_room(i, j)
+                    for k in (0, 1):
+                        neighbor = room.neighbors[k]
+                        if not room.door_pos[k] or room.doors[k]:
+                            continue
+                        if room.locked or neighbor.locked:
+                            continue
+                        if self._room_set(room) == self._room_set(neighbor):
+                            continue
+                        candidates.append((i, j, k))
+
+            # This is to handle situations where locked rooms make it
+            # impossible to connect the level
+            if len(candidates) == 0:
+                raise RecursionError('connect_all failed')
 
+            i, j, k = self._rand_elem(candidates)
             color = self._rand_elem(door_colors)
             door, _ = self.add_door(i, j, k, color, False)
             added_doors.append(door)
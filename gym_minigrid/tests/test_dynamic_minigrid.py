@@ -2,8 +2,9 @@ import pytest
 import numpy as np
 
 from pytest import fixture
-from gym_minigrid.envs.dynamic_minigrid import DynamicMiniGrid
-from gym_minigrid.minigrid import Wall
+from gym_minigrid.envs.dynamic_minigrid import DynamicMiniGrid, AlterationJournal
+from gym_minigrid.minigrid import Lava, Wall
+from gym_minigrid.planning import in_view_square, shortest_path_length
 
 
 @fixture
@@ -84,3 +85,148 @@ def test_solvability_check(dyn_grid, prob_array):
 
 
 
+
+
+def test_check_solvable_shortest_path():
+    dyn_grid = DynamicMiniGrid()
+
+    # Move right to (6, 1), turn right, move down to the goal at (6, 6)
+    assert dyn_grid.check_solvable() == (True, 11)
+
+    # Lava on the way forces the agent to go down column 5
+    dyn_grid.put_obj(Lava(), 6, 3)
+    assert dyn_grid.check_solvable() == (True, 12)
+
+    rng_state = dyn_grid.np_random.bit_generator.state
+    dyn_grid.put_obj(Wall(), 1, 2)
+    dyn_grid.put_obj(Wall(), 2, 1)
+    dyn_grid.put_obj(Wall(), 2, 2)
+    assert dyn_grid.check_solvable() == (False, None)
+    assert dyn_grid.np_random.bit_generator.state == rng_state
+
+
+def test_journal_undo_redo_checkout(tmp_path):
+    prob_dict = {'alter_start_pos': 0.25, 'alter_goal_pos': 0.25, 'wall': 0.25, 'lava': 0.125, 'sand': 0.125}
+    dyn_grid = DynamicMiniGrid()
+
+    def state():
+        return dyn_grid.grid.encode().tobytes(), dyn_grid.agent_start_pos, dyn_grid.agent_start_dir
+
+    states = [state()]
+    for _ in range(20):
+        dyn_grid.alter(prob_dict)
+        states.append(state())
+    assert len(dyn_grid.journal) == 20
+
+    for version in [20, 7, 0, 13, 20, 1]:
+        dyn_grid.checkout(version)
+        assert state() == states[version]
+        assert dyn_grid.check_solvable()[1] == shortest_path_length(
+            dyn_grid.grid.encode(), dyn_grid.agent_start_pos, dyn_grid.agent_start_dir)
+
+    dyn_grid.undo()
+    assert state() == states[0]
+    with pytest.raises(ValueError):
+        dyn_grid.undo()
+    dyn_grid.redo()
+    assert state() == states[1]
+
+    # Replay a serialized journal on a new environment
+    dyn_grid.checkout(20)
+    path = str(tmp_path / 'journal.bin')
+    dyn_grid.journal.save(path)
+    replayed = DynamicMiniGrid()
+    replayed.load_journal(AlterationJournal.load(path), version=12)
+    assert replayed.grid.encode().tobytes() == states[12][0]
+    assert (replayed.agent_start_pos, replayed.agent_start_dir) == states[12][1:]
+
+    # Altering after an undo discards the alterations undone
+    replayed.alter(prob_dict)
+    assert len(replayed.journal) == 13
+
+    # Loading a journal in an altered environment replays it from the
+    # level of the last reset, and doesn't modify or share the journal
+    journal = dyn_grid.journal
+    replayed.load_journal(journal, version=5)
+    assert state() == states[20]
+    assert journal.position == 20
+    assert replayed.journal is not journal
+    assert replayed.grid.encode().tobytes() == states[5][0]
+    assert (replayed.agent_start_pos, replayed.agent_start_dir) == states[5][1:]
+
+
+def test_journal_restarts_at_reset():
+    prob_dict = {'alter_start_pos': 0.25, 'alter_goal_pos': 0.25, 'wall': 0.25, 'lava': 0.125, 'sand': 0.125}
+    dyn_grid = DynamicMiniGrid()
+    for _ in range(10):
+        dyn_grid.alter(prob_dict)
+
+    # The entries of the previous level can't be applied to the new one
+    dyn_grid.reset()
+    assert len(dyn_grid.journal) == 0
+    with pytest.raises(ValueError):
+        dyn_grid.checkout(3)
+
+    levels = [dyn_grid.grid.encode().tobytes()]
+    for _ in range(5):
+        dyn_grid.alter(prob_dict)
+        levels.append(dyn_grid.grid.encode().tobytes())
+    for version in [3, 0, 5]:
+        dyn_grid.checkout(version)
+        assert dyn_grid.grid.encode().tobytes() == levels[version]
+
+
+def test_goal_pos_follows_alterations():
+    prob_dict = {'alter_start_pos': 0, 'alter_goal_pos': 1, 'wall': 0, 'lava': 0, 'sand': 0}
+    assert DynamicMiniGrid(lazy_init=True).goal_pos is None
+
+    dyn_grid = DynamicMiniGrid()
+    goal_positions = [dyn_grid.goal_pos]
+    for _ in range(5):
+        dyn_grid.alter(prob_dict)
+        assert dyn_grid.grid.get(*dyn_grid.goal_pos).type == 'goal'
+        goal_positions.append(dyn_grid.goal_pos)
+    dyn_grid.checkout(2)
+    assert dyn_grid.goal_pos == goal_positions[2]
+
+    # Without a goal, alterations add one
+    dyn_grid.grid.set(*dyn_grid.goal_pos, None)
+    dyn_grid.goal_pos = None
+    dyn_grid.alter(prob_dict)
+    assert dyn_grid.grid.find('goal') == [dyn_grid.goal_pos]
+
+
+def test_alter_goal_pos_hidden_from_start():
+    prob_dict = {'alter_start_pos': 0, 'alter_goal_pos': 1, 'wall': 0, 'lava': 0, 'sand': 0}
+    dyn_grid = DynamicMiniGrid(size=12)
+
+    for _ in range(30):
+        # The goal is checked against the start pose, not the current one
+        for action in [dyn_grid.actions.forward] * 3 + [dyn_grid.actions.right]:
+            dyn_grid.step(action)
+        dyn_grid.alter(prob_dict, visibility_check=True)
+        assert not in_view_square(
+            dyn_grid.agent_start_pos, dyn_grid.agent_start_dir,
+            dyn_grid.agent_view_size, dyn_grid.goal_pos
+        )
+
+
+def test_alter_start_pos_candidates():
+    prob_dict = {'alter_start_pos': 1, 'alter_goal_pos': 0, 'wall': 0, 'lava': 0, 'sand': 0}
+    dyn_grid = DynamicMiniGrid(size=12)
+
+    for _ in range(20):
+        start_pos = dyn_grid.agent_start_pos
+        dyn_grid.alter(prob_dict, visibility_check=True)
+        assert dyn_grid.agent_start_pos != start_pos
+        assert dyn_grid.grid.get(*dyn_grid.agent_start_pos) is None
+        assert not dyn_grid.in_view(*dyn_grid.goal_pos)
+
+    # Without any empty cell to move to, the start pose is left as it is
+    for i in range(1, 11):
+        for j in range(1, 11):
+            if (i, j) != dyn_grid.agent_start_pos and (i, j) != dyn_grid.goal_pos:
+                dyn_grid.put_obj(Wall(), i, j)
+    start = (dyn_grid.agent_start_pos, dyn_grid.agent_start_dir)
+    dyn_grid.alter(prob_dict)
+    assert (dyn_grid.agent_start_pos, dyn_grid.agent_start_dir) == start
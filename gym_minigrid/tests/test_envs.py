@@ -0,0 +1,160 @@
+from gym_minigrid.envs.dynamicobstacles import DynamicObstaclesEnv
+from gym_minigrid.envs.keycorridor import KeyCorridor
+from gym_minigrid.envs.multiroom import MultiRoomEnv
+
+
+def _reachable_rooms(env):
+    start_room = env.room_from_pos(*env.agent_pos)
+    reach = set()
+    stack = [start_room]
+    while stack:
+        room = stack.pop()
+        if room in reach:
+            continue
+        reach.add(room)
+        for k in range(4):
+            if room.doors[k]:
+                stack.append(room.neighbors[k])
+    return reach
+
+
+def test_connect_all_large_room_grid():
+    env = KeyCorridor(num_rows=8, room_size=4)
+    for seed in range(20):
+        env.seed(seed)
+        env.reset()
+        assert env.num_room_sets == 1
+        assert len(_reachable_rooms(env)) == env.num_rows * env.num_cols
+
+
+def test_multiroom_many_rooms():
+    env = MultiRoomEnv(minNumRooms=10, maxNumRooms=12, maxRoomSize=6, size=40)
+    for seed in range(10):
+        env.seed(seed)
+        env.reset()
+        assert 10 <= len(env.rooms) <= 12
+
+        # Rooms only share walls with the rooms they are connected to
+        for i, room in enumerate(env.rooms):
+            for other in env.rooms[i + 2:]:
+                overlap_x = min(room.top[0] + room.size[0], other.top[0] + other.size[0]) - max(room.top[0], other.top[0])
+                overlap_y = min(room.top[1] + room.size[1], other.top[1] + other.size[1]) - max(room.top[1], other.top[1])
+                assert overlap_x <= 0 or overlap_y <= 0
+
+
+def test_multiroom_gen_budget_reseeds():
+    import pytest
+    from gym_minigrid.minigrid import GenBudgetExceeded
+
+    env = MultiRoomEnv(minNumRooms=6, maxNumRooms=6)
+    env.set_gen_budget(max_retries=20, max_reseeds=50)
+
+    hashes = []
+    num_reseeds = 0
+    for seed in range(10):
+        env.seed(seed)
+        env.reset()
+        assert len(env.rooms) == 6
+        num_reseeds += env.gen_reseeds
+        hashes.append(env.hash())
+        # The draws of the abandoned attempts are counted
+        if env.gen_reseeds > 0:
+            assert env.rng.num_draws > env.np_random.num_calls
+    assert num_reseeds > 0
+
+    # Reseeding is deterministic for retry budgets
+    for seed in range(10):
+        env.seed(seed)
+        env.reset()
+        assert env.hash() == hashes[seed]
+
+    env.set_gen_budget(max_retries=0, max_reseeds=2)
+    env.seed(0)
+    with pytest.raises(GenBudgetExceeded):
+        env.reset()
+
+
+def test_gen_retries_only_counted_during_generation():
+    env = DynamicObstaclesEnv()
+    env.set_gen_budget(max_retries=1000)
+    env.seed(0)
+    env.reset()
+    gen_retries = env.gen_retries
+
+    # Obstacles placed by step() don't count towards the budget
+    env.set_gen_budget(max_retries=0, max_reseeds=0)
+    for _ in range(200):
+        _, _, done, _ = env.step(env.actions.left)
+        if done:
+            break
+    assert env.gen_retries == gen_retries
+
+
+def test_level_state_attrs_cover_gen_grid():
+    import gym
+    from gym_minigrid.minigrid import LEVEL_ATTRS
+    from gym_minigrid.register import env_list
+
+    # Attributes recording how the level was generated
+    gen_stats = {'gen_retries', 'gen_reseeds', '_gen_limits'}
+
+    for env_id in env_list:
+        env = gym.make(env_id).unwrapped
+        for seed in range(3):
+            env.seed(seed)
+            before = dict(vars(env))
+            env._gen_grid_checked()
+            changed = {
+                name for name, value in vars(env).items()
+                if name not in before or before[name] is not value
+            }
+            declared = set(LEVEL_ATTRS) | set(env.level_state_attrs)
+            assert changed - gen_stats <= declared, (env_id, changed - gen_stats - declared)
+            assert set(env.get_level_state()) == declared
+
+
+def test_lazy_registration():
+    import importlib
+    import subprocess
+    import sys
+    import gym
+    from gym_minigrid.register import ENV_TABLE, env_list
+
+    # Importing gym_minigrid doesn't import the environment modules,
+    # making an environment only imports its own module
+    code = (
+        'import sys, gym, gym_minigrid\n'
+        'def loaded(): return sorted(m for m in sys.modules if m.startswith("gym_minigrid.envs."))\n'
+        'assert loaded() == [], loaded()\n'
+        'gym.make("MiniGrid-LavaGapS5-v0")\n'
+        'assert loaded() == ["gym_minigrid.envs.lavagap"], loaded()\n'
+    )
+    subprocess.run([sys.executable, '-W', 'ignore', '-c', code], check=True)
+
+    # The static table matches the classes of the environment modules
+    assert len(env_list) == sum(len(envs) for _, envs in ENV_TABLE)
+    for env_id in env_list:
+        module, class_name = gym.envs.registry.spec(env_id).entry_point.split(':')
+        assert hasattr(importlib.import_module(module), class_name)
+
+    # Every class defined in the environment modules can be accessed lazily
+    import inspect
+    import pkgutil
+    import gym_minigrid.envs as envs
+    for module_info in pkgutil.iter_modules(envs.__path__):
+        module_name = module_info.name
+        if module_name == 'dynamic_minigrid_visualization':
+            # Script rendering alterations
+            continue
+        module = importlib.import_module('gym_minigrid.envs.' + module_name)
+        for name, value in vars(module).items():
+            if inspect.isclass(value) and value.__module__ == module.__name__:
+                assert name in envs._CLASS_MODULES, (module_name, name)
+
+    # Star imports still provide the base classes and the classes of
+    # every environment module
+    namespace = {}
+    exec('from gym_minigrid.envs import *', namespace)
+    for name in ['Grid', 'MiniGridEnv', 'Door', 'Key', 'Goal', 'OBJECT_TO_IDX', 'DoorKeyEnv', 'Room']:
+        assert name in namespace, name
+    assert namespace['Room'].__module__ == 'gym_minigrid.envs.lockedroom'
@@ -0,0 +1,9 @@
+from gym_minigrid.gen_profiler import profile_seeds, report
+
+
+def test_profile_seeds():
+    results = profile_seeds('MiniGrid-MultiRoom-N4-S5-v0', range(5, 13), num_workers=2)
+    assert list(results['seed']) == list(range(5, 13))
+    assert (results['time'] > 0).all()
+    assert (results['draws'] > 0).all()
+    assert 'seed' in report(results, num_slow=3)
@@ -0,0 +1,246 @@
+import copy
+import pickle
+
+import numpy as np
+
+from gym_minigrid.envs.empty import EmptyEnv
+from gym_minigrid.envs.doorkey import DoorKeyEnv
+from gym_minigrid.envs.dynamic_minigrid import DynamicMiniGrid
+from gym_minigrid.minigrid import Door, Goal, Grid, Key, LazyObs, MiniGridEnv, Wall
+from gym_minigrid.wrappers import FullyObsWrapper, RGBImgObsWrapper
+
+
+def test_obs_buffers_match_default_obs():
+    env = DoorKeyEnv(size=6)
+    ref_env = DoorKeyEnv(size=6)
+
+    image = np.zeros((env.agent_view_size, env.agent_view_size, 3), dtype=np.uint8)
+    direction = np.zeros((), dtype=np.int64)
+    env.set_obs_buffers(image, direction)
+
+    obs = env.reset()
+    ref_obs = ref_env.reset()
+    assert obs['image'] is image
+    assert np.array_equal(image, ref_obs['image'])
+
+    for action in [0, 2, 1, 2, 2, 1]:
+        obs, _, _, _ = env.step(action)
+        ref_obs, _, _, _ = ref_env.step(action)
+        assert obs['image'] is image
+        assert np.array_equal(image, ref_obs['image'])
+        assert int(direction) == ref_obs['direction']
+        assert obs['mission'] == ref_obs['mission']
+
+
+def test_obs_buffers_can_be_released():
+    env = EmptyEnv()
+    image = np.zeros((env.agent_view_size, env.agent_view_size, 3), dtype=np.uint8)
+    env.set_obs_buffers(image)
+    assert env.reset()['image'] is image
+
+    env.set_obs_buffers()
+    assert env.reset()['image'] is not image
+
+
+def test_grid_index_tracks_set():
+    grid = Grid(5, 5)
+    grid.wall_rect(0, 0, 5, 5)
+    assert ('green', 'goal') not in grid
+
+    grid.set(3, 3, Goal())
+    key = Key('yellow')
+    grid.set(1, 2, key)
+    assert ('green', 'goal') in grid
+    assert (None, 'key') in grid
+    assert key in grid
+    assert grid.find('goal') == [(3, 3)]
+    assert grid.find('key', 'yellow') == [(1, 2)]
+    assert len(grid.find('wall')) == 16
+
+    grid.set(1, 2, None)
+    assert key not in grid
+    assert grid.find('key') == []
+
+
+def test_grid_eq_uses_door_states():
+    grid1 = Grid(4, 4)
+    grid2 = Grid(4, 4)
+    grid1.set(1, 1, Door('red', is_open=False))
+    grid2.set(1, 1, Door('red', is_open=True))
+    assert grid1 != grid2
+
+    grid2.get(1, 1).is_open = False
+    assert grid1 == grid2
+
+    grid2.set(2, 2, Wall())
+    assert grid1 != grid2
+
+
+def test_level_bank_reset(tmp_path):
+    import gym
+    import pytest
+    from gym_minigrid.level_bank import LevelBank, build_level_bank
+
+    path = str(tmp_path / 'doorkey.npy')
+    build_level_bank('MiniGrid-DoorKey-6x6-v0', range(10, 20), path)
+    bank = LevelBank(path)
+    assert len(bank) == 10 and 15 in bank and 20 not in bank
+
+    env = gym.make('MiniGrid-DoorKey-6x6-v0').unwrapped
+    ref_env = gym.make('MiniGrid-DoorKey-6x6-v0').unwrapped
+    env.set_level_bank(bank)
+
+    for seed in [12, 19, 10]:
+        env.seed(seed)
+        obs = env.reset()
+        ref_env.seed(seed)
+        ref_obs = ref_env.reset()
+        assert env.grid == ref_env.grid
+        assert tuple(env.agent_pos) == tuple(ref_env.agent_pos)
+        assert env.agent_dir == ref_env.agent_dir
+        assert np.array_equal(obs['image'], ref_obs['image'])
+        assert obs['mission'] == ref_obs['mission']
+
+    # Environments with extra generated state can't be stored
+    with pytest.raises(ValueError, match='targetType, targetColor'):
+        build_level_bank('MiniGrid-Fetch-5x5-N2-v0', range(2), str(tmp_path / 'fetch.npy'))
+
+
+def test_place_obj_crowded_grid():
+    import pytest
+    from gym_minigrid.minigrid import Ball
+
+    env = EmptyEnv(size=8)
+    env.reset()
+
+    # Fill the grid up to two empty cells besides the agent's and the goal's
+    for i in range(1, 7):
+        for j in range(1, 7):
+            if (i, j) not in [(1, 1), (5, 4), (3, 3), (6, 6)]:
+                env.grid.set(i, j, Wall())
+
+    # Only (5, 4) is acceptable
+    reject_corner = lambda env, pos: tuple(pos) == (3, 3)
+    pos = env.place_obj(Ball(), reject_fn=reject_corner)
+    assert tuple(pos) == (5, 4)
+    # The agent position and (3, 3) are left
+    assert env.grid.free_mask().sum() == 2
+
+    # No candidate left besides the agent's position and a rejected one
+    with pytest.raises(RecursionError):
+        env.place_obj(Ball(), reject_fn=reject_corner)
+    env.place_obj(Ball())
+    with pytest.raises(RecursionError):
+        env.place_obj(Ball())
+
+
+def test_reset_cache_restores_levels():
+    env = DoorKeyEnv(size=8)
+    ref_env = DoorKeyEnv(size=8)
+    env.set_reset_cache(max_size=2)
+
+    for seed in [0, 1, 0, 2, 0, 1]:
+        env.seed(seed)
+        ref_env.seed(seed)
+        env.reset()
+        ref_env.reset()
+        assert env.hash() == ref_env.hash()
+        assert env.grid == ref_env.grid
+        assert env.np_random.integers(1000) == ref_env.np_random.integers(1000)
+
+        # Episodes must not change the cached level
+        door_pos = env.grid.find('door')[0]
+        env.grid.get(*door_pos).is_open = True
+    assert len(env.reset_cache) == 2
+
+    env.set_reset_cache(None)
+    env.seed(0)
+    env.reset()
+    assert env.reset_cache is None
+
+
+def test_lazy_init_generates_level_at_reset(monkeypatch):
+    env = DoorKeyEnv(size=8)
+    unseeded_env = DoorKeyEnv(size=8)
+    monkeypatch.setattr(MiniGridEnv, 'lazy_init', True)
+    lazy_env = DoorKeyEnv(size=8)
+    assert lazy_env.grid is None
+
+    env.seed(3)
+    lazy_env.seed(3)
+    env.reset()
+    lazy_env.reset()
+    assert env.hash() == lazy_env.hash()
+
+    # Unseeded, the first reset generates the level of the eager constructor
+    lazy_env = DoorKeyEnv(size=8)
+    constructor_hash = unseeded_env.hash()
+    lazy_env.reset()
+    assert lazy_env.hash() == constructor_hash
+    unseeded_env.reset()
+    lazy_env.reset()
+    assert unseeded_env.hash() == lazy_env.hash()
+
+    dyn_env = DynamicMiniGrid(lazy_init=True)
+    assert dyn_env.grid is None
+    dyn_env.respawn()
+    assert dyn_env.agent_pos == (1, 1)
+
+
+def test_lazy_obs_image():
+    env = DoorKeyEnv(size=6)
+    num_images = []
+    gen_obs_image = env._gen_obs_image
+    env._gen_obs_image = lambda: num_images.append(1) or gen_obs_image()
+
+    # Wrappers replacing the image don't generate it
+    for wrapper in [FullyObsWrapper, RGBImgObsWrapper]:
+        wrapped = wrapper(env)
+        wrapped.reset()
+        wrapped.step(0)
+    assert num_images == []
+
+    # Images are those of the state the observation was generated for
+    obs = env.reset()
+    ref_image = gen_obs_image()
+    env.step(0)
+    assert len(num_images) == 1
+    assert isinstance(obs, LazyObs)
+    assert np.array_equal(obs['image'], ref_image)
+
+    obs = env.step(1)[0]
+    ref_image = gen_obs_image()
+    for copied in [dict(obs), {**obs}, obs.copy(), copy.deepcopy(obs), pickle.loads(pickle.dumps(obs))]:
+        assert type(copied) is dict
+        assert list(copied) == ['image', 'direction', 'mission']
+        assert np.array_equal(copied['image'], ref_image)
+
+    obs = env.step(1)[0]
+    obs['image'] = None
+    assert obs['image'] is None
+    assert len(num_images) == 2
+
+
+def test_lazy_obs_direct_changes():
+    import pytest
+
+    env = EmptyEnv(size=6)
+
+    # The image can't be generated once the agent or the grid was changed
+    # directly, as the state the observation was made in is gone
+    obs = env.reset()
+    env.agent_pos = (2, 2)
+    with pytest.raises(RuntimeError):
+        obs['image']
+
+    obs = env.reset()
+    env.grid.set(3, 1, Wall())
+    with pytest.raises(RuntimeError):
+        obs['image']
+
+    # Unless the image is generated first
+    obs = env.reset()
+    ref_image = copy.deepcopy(env).gen_obs()['image']
+    env._materialize_obs()
+    env.agent_dir = (env.agent_dir + 1) % 4
+    assert np.array_equal(obs['image'], ref_image)
@@ -0,0 +1,142 @@
+import copy
+import random
+from multiprocessing.pool import ThreadPool
+
+import gym
+import numpy as np
+
+from gym_minigrid.envs.dynamic_minigrid import DynamicMiniGrid
+from gym_minigrid.minigrid import MiniGridEnv, Lava, Wall
+from gym_minigrid.planning import ReachabilityTracker, passable_mask, in_view_square, shortest_path_length
+
+
+def test_reachability_tracker_matches_recompute():
+    rng = random.Random(0)
+    env = DynamicMiniGrid(size=8)
+    reach = ReachabilityTracker(passable_mask(env.grid.encode()), (1, 1), 0)
+
+    for _ in range(200):
+        pos = (rng.randrange(1, 7), rng.randrange(1, 7))
+        if pos in [(1, 1), (6, 6)]:
+            continue
+        if env.grid.get(*pos) is None:
+            env.grid.set(*pos, rng.choice([Wall(), Lava()]))
+        else:
+            env.grid.set(*pos, None)
+        reach.set_passable(*pos, env.grid.get(*pos) is None)
+
+        ref = ReachabilityTracker(passable_mask(env.grid.encode()), (1, 1), 0)
+        assert reach.dist == ref.dist
+        assert reach.goal_distance([(6, 6)]) == ref.goal_distance([(6, 6)])
+
+
+def test_reachability_tracker_blocked_start():
+    rng = random.Random(1)
+    env = DynamicMiniGrid(size=8)
+    reach = ReachabilityTracker(passable_mask(env.grid.encode()), (1, 1), 0)
+
+    # The agent can still leave its start cell after it was blocked
+    for _ in range(300):
+        pos = rng.choice([(1, 1), (1, 1), (2, 1), (1, 2), (2, 2), (3, 1), (1, 3)])
+        if env.grid.get(*pos) is None:
+            env.grid.set(*pos, Wall())
+        else:
+            env.grid.set(*pos, None)
+        reach.set_passable(*pos, env.grid.get(*pos) is None)
+
+        ref = ReachabilityTracker(passable_mask(env.grid.encode()), (1, 1), 0)
+        assert reach.dist == ref.dist
+        assert reach.goal_distance([(6, 6)]) == ref.goal_distance([(6, 6)])
+
+
+def test_evaluate_alterations_matches_check_solvable():
+    prob_dict = {'alter_start_pos': 0.25, 'alter_goal_pos': 0.25, 'wall': 0.25, 'lava': 0.125, 'sand': 0.125}
+    env = DynamicMiniGrid(size=8)
+    for _ in range(10):
+        env.alter({'alter_start_pos': 0, 'alter_goal_pos': 0, 'wall': 0.5, 'lava': 0.5, 'sand': 0})
+
+    alterations = env.sample_alterations(prob_dict, 40)
+    solvable, steps, goal_in_view = env.evaluate_alterations(alterations)
+    with ThreadPool(2) as pool:
+        pooled = env.evaluate_alterations(alterations, pool=pool, chunk_size=7)
+    for expected, actual in zip((solvable, steps, goal_in_view), pooled):
+        assert np.array_equal(expected, actual)
+
+    grid = env.grid.encode()
+    start = (env.agent_start_pos, env.agent_start_dir)
+    for k, alteration in enumerate(alterations):
+        test_env = DynamicMiniGrid(size=8)
+        test_env.grid = env.grid.copy()
+        test_env.agent_start_pos, test_env.agent_start_dir = start
+        test_env.agent_pos, test_env.agent_dir = start
+        test_env.apply_alteration(alteration)
+
+        assert test_env.check_solvable() == (bool(solvable[k]), steps[k] if solvable[k] else None)
+        assert goal_in_view[k] == in_view_square(
+            test_env.agent_start_pos, test_env.agent_start_dir,
+            test_env.agent_view_size, test_env.goal_pos
+        )
+
+    # Sampling and evaluating leaves the grid as it was
+    assert np.array_equal(env.grid.encode(), grid)
+
+
+def test_goal_distance_field_matches_shortest_path():
+    env = gym.make('MiniGrid-LavaCrossingS9N2-v0').unwrapped
+    env.seed(3)
+    env.reset()
+
+    array = env.grid.encode()
+    field = env.goal_distance_field()
+    passable = passable_mask(array)
+    for i in range(env.width):
+        for j in range(env.height):
+            for dir in range(4):
+                expected = shortest_path_length(array, (i, j), dir) if passable[i, j] else None
+                assert field[i, j, dir] == (-1 if expected is None else expected)
+
+    steps = env.optimal_steps()
+    assert env.optimal_return() == 1 - 0.9 * (steps / env.max_steps)
+
+    # The field is cached until the grid changes
+    assert env.goal_distance_field() is field
+    env.grid.set(*env.grid.find('goal')[0], None)
+    assert env.optimal_steps() is None
+    assert env.optimal_return() is None
+
+
+def test_dynamic_optimal_steps_follow_alterations():
+    env = DynamicMiniGrid()
+    assert env.optimal_steps() == 11
+    for _ in range(20):
+        env.alter({'alter_start_pos': 0.25, 'alter_goal_pos': 0.25, 'wall': 0.25, 'lava': 0.125, 'sand': 0.125})
+        assert env.optimal_steps() == MiniGridEnv.optimal_steps(env)
+
+
+def test_optimal_steps_open_doors():
+    env = gym.make('MiniGrid-MultiRoom-N2-S4-v0').unwrapped
+    for seed in range(5):
+        env.seed(seed)
+        env.reset()
+        steps = env.optimal_steps()
+        assert steps is not None
+        expected_return = env.optimal_return()
+        assert 0 < expected_return < 1
+
+        # Follow the distances down to the goal, opening the doors on the way
+        for step in range(steps):
+            for action in [env.actions.forward, env.actions.toggle, env.actions.left, env.actions.right]:
+                next_env = copy.deepcopy(env)
+                _, reward, done, _ = next_env.step(action)
+                if (done and reward > 0) or (not done and next_env.optimal_steps() == steps - step - 1):
+                    env = next_env
+                    break
+            else:
+                assert False, 'no action gets closer to the goal'
+        assert done and reward == expected_return
+
+    # The key needed to unlock the door isn't planned for
+    env = gym.make('MiniGrid-DoorKey-5x5-v0').unwrapped
+    env.reset()
+    assert env.optimal_steps() is None
+    assert env.optimal_return() is None
@@ -0,0 +1,66 @@
+import copy
+import pytest
+import numpy as np
+
+from gym_minigrid.population import LevelPopulation, load_level
+
+PROB_DICT = {'alter_start_pos': 0.25, 'alter_goal_pos': 0.25, 'wall': 0.25, 'lava': 0.125, 'sand': 0.125}
+
+
+def forward_policy(obs):
+    return 2
+
+
+def test_level_population_alter_and_evaluate():
+    population = LevelPopulation(6, num_workers=2, size=8)
+    try:
+        assert np.array_equal(population.alter(PROB_DICT, [], [])[0], [])
+
+        solvable, steps = population.alter(PROB_DICT, [0, 1], [2, 3], num_alterations=3)
+        for dst, is_solvable, num_steps in zip([2, 3], solvable, steps):
+            env = population.get_env(dst)
+            assert len(env.journal) == 0
+            assert env.check_solvable() == (is_solvable, num_steps if is_solvable else None)
+
+        # Unaltered levels are unchanged
+        assert np.array_equal(population.shared['grid'][0], population.shared['grid'][5])
+
+        # Levels can't be overwritten while other alterations read them
+        with pytest.raises(ValueError):
+            population.alter(PROB_DICT, [0, 1], [1, 2])
+        with pytest.raises(ValueError):
+            population.alter(PROB_DICT, [0, 0])
+        with pytest.raises(ValueError):
+            population.alter(PROB_DICT, [0, 1], [2, 2])
+        population.alter(PROB_DICT, [3, 1, 1], [3, 2, 5])
+
+        scores = population.evaluate(forward_policy, indices=[0, 1], chunksize=1)
+        assert scores.shape == (2,)
+        assert np.all(scores == 0)
+
+        # Levels can be modified in the main process
+        env = population.get_env(4)
+        env.agent_start_pos = (6, 5)
+        env.agent_start_dir = 1
+        population.set_level(4, env)
+        env.respawn()
+        scores = population.evaluate(forward_policy, indices=[4])
+        assert scores[0] == env.optimal_return() == 1 - 0.9 / env.max_steps
+    finally:
+        population.close()
+
+
+def test_load_level_keeps_last_observation():
+    population = LevelPopulation(2, num_workers=1, size=8)
+    try:
+        population.alter(PROB_DICT, [1], num_alterations=5)
+        env = population.get_env(0)
+        obs = env.reset()
+        expected = copy.deepcopy(env).gen_obs()['image']
+
+        # The pending observation shows the level it was generated from
+        new_obs = load_level(env, population.shared, 1)
+        assert not np.array_equal(new_obs['image'], expected)
+        assert np.array_equal(obs['image'], expected)
+    finally:
+        population.close()
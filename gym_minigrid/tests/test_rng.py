@@ -0,0 +1,62 @@
+from gym.utils import seeding
+
+from gym_minigrid.envs.obstructedmaze import ObstructedMaze_Full
+from gym_minigrid.rng import make_rng
+
+
+def test_legacy_rng_matches_gym_seeding():
+    rng = make_rng(7, 'legacy')
+    ref, _ = seeding.np_random(7)
+    for high in range(1, 50):
+        assert rng.integers(0, high) == ref.integers(0, high)
+    assert rng.uniform(0, 1) == ref.uniform(0, 1)
+    assert rng.num_draws == 50
+
+
+def test_direct_generator_draws_counted():
+    import pickle
+
+    for mode in ['legacy', 'block']:
+        rng = make_rng(3, mode)
+        rng.integers(0, 10)
+        rng.np_random.shuffle([1, 2, 3])
+        rng.np_random.choice(5)
+        assert rng.num_draws == 3
+
+        # Copies keep the count and the generator state
+        copy = pickle.loads(pickle.dumps(rng))
+        assert copy.num_draws == 3
+        assert copy.np_random.integers(0, 1000) == rng.np_random.integers(0, 1000)
+
+
+def test_block_rng_state_and_streams():
+    rng = make_rng(7, 'block')
+    draws = [rng.integers(3, 10) for _ in range(2000)]
+    assert min(draws) == 3 and max(draws) == 9
+
+    # Restoring a state replays the same draws, across block boundaries
+    state = rng.get_state()
+    first = [rng.integers(0, 1000) for _ in range(100)]
+    rng.set_state(state)
+    assert [rng.integers(0, 1000) for _ in range(100)] == first
+
+    lst = list(range(10))
+    subset = rng.subset(lst, 4)
+    assert len(set(subset)) == 4 and sorted(subset + lst) == list(range(10))
+
+    child1, child2 = rng.spawn(2)
+    assert [child1.integers(0, 2 ** 30) for _ in range(4)] != \
+        [child2.integers(0, 2 ** 30) for _ in range(4)]
+
+
+def test_block_rng_env_levels():
+    env = ObstructedMaze_Full()
+    env.rng_mode = 'block'
+    hashes = []
+    for seed in range(5):
+        env.seed(seed)
+        env.reset()
+        hashes.append(env.hash())
+    env.seed(3)
+    env.reset()
+    assert env.hash() == hashes[3]
@@ -0,0 +1,219 @@
+import threading
+
+import gym
+import pytest
+import numpy as np
+
+import gym_minigrid
+from gym_minigrid.vec_env import AsyncEnvPool, SharedMemoryVecEnv
+from gym_minigrid.wrappers import FullyObsWrapper
+
+ENV_ID = 'MiniGrid-DoorKey-5x5-v0'
+
+
+def make_fully_obs_env():
+    return FullyObsWrapper(gym.make(ENV_ID))
+
+
+class UnpicklableError(Exception):
+    def __init__(self):
+        super().__init__('step failed')
+        self.lock = threading.Lock()
+
+
+class FailingStepWrapper(gym.Wrapper):
+    def step(self, action):
+        raise UnpicklableError()
+
+
+def make_failing_env():
+    return FailingStepWrapper(gym.make(ENV_ID))
+
+
+def test_shared_memory_vec_env_matches_single_envs():
+    seeds = [1, 2, 3]
+    vec_env = SharedMemoryVecEnv([ENV_ID] * 3, num_workers=2, seeds=seeds)
+
+    envs = []
+    for seed in seeds:
+        env = gym.make(ENV_ID)
+        env.seed(seed)
+        envs.append(env)
+
+    try:
+        obs = vec_env.reset()
+        for i, env in enumerate(envs):
+            ref_obs = env.reset()
+            assert np.array_equal(obs['image'][i], ref_obs['image'])
+            assert obs['direction'][i] == ref_obs['direction']
+
+        assert vec_env.get_missions() == [env.unwrapped.mission for env in envs]
+
+        rng = np.random.RandomState(0)
+        for _ in range(40):
+            actions = rng.randint(0, 3, size=len(envs))
+            obs, rewards, dones, _ = vec_env.step(actions)
+
+            for i, env in enumerate(envs):
+                ref_obs, ref_reward, ref_done, _ = env.step(actions[i])
+                if ref_done:
+                    ref_obs = env.reset()
+                assert np.array_equal(obs['image'][i], ref_obs['image'])
+                assert obs['direction'][i] == ref_obs['direction']
+                assert rewards[i] == ref_reward
+                assert dones[i] == ref_done
+    finally:
+        vec_env.close()
+
+
+def test_vec_envs_wrapped_observations():
+    seeds = [1, 2]
+    vec_env = SharedMemoryVecEnv([make_fully_obs_env] * 2, seeds=seeds)
+    pool = AsyncEnvPool([make_fully_obs_env] * 2, backend='process', seeds=seeds)
+
+    envs = []
+    for seed in seeds:
+        env = make_fully_obs_env()
+        env.seed(seed)
+        envs.append(env)
+
+    try:
+        assert vec_env.observation_space['image'].shape == (5, 5, 3)
+        assert pool.observation_space['image'].shape == (5, 5, 3)
+        assert vec_env.observation_space['direction'] == gym.spaces.Discrete(4)
+
+        obs = vec_env.reset()
+        pool.async_reset()
+        pool_obs, _, _, env_ids = pool.recv(2)
+        pool_images = pool_obs['image'][np.argsort(env_ids)]
+        for i, env in enumerate(envs):
+            ref_obs = env.reset()
+            assert np.array_equal(obs['image'][i], ref_obs['image'])
+            assert np.array_equal(pool_images[i], ref_obs['image'])
+            assert obs['direction'][i] == env.unwrapped.agent_dir
+
+        actions = [1, 2]
+        obs, _, _, _ = vec_env.step(actions)
+        for i, env in enumerate(envs):
+            ref_obs, _, _, _ = env.step(actions[i])
+            assert np.array_equal(obs['image'][i], ref_obs['image'])
+            assert obs['direction'][i] == env.unwrapped.agent_dir
+    finally:
+        vec_env.close()
+        pool.close()
+
+
+def _check_async_pool(backend):
+    seeds = [4, 5, 6, 7]
+    pool = AsyncEnvPool([ENV_ID] * 4, batch_size=2, num_workers=2,
+                        backend=backend, seeds=seeds, timing=True)
+
+    envs = []
+    for seed in seeds:
+        env = gym.make(ENV_ID)
+        env.seed(seed)
+        env.reset()
+        envs.append(env)
+
+    try:
+        pool.async_reset()
+        obs, _, _, env_ids = pool.recv(4)
+        assert sorted(env_ids) == [0, 1, 2, 3]
+
+        rng = np.random.RandomState(0)
+        for _ in range(30):
+            actions = rng.randint(0, 3, size=len(env_ids))
+            pool.send(actions, env_ids)
+            obs, rewards, dones, env_ids_out = pool.recv(len(env_ids))
+
+            for action, env_id in zip(actions, env_ids):
+                ref_obs, ref_reward, ref_done, _ = envs[env_id].step(action)
+                if ref_done:
+                    ref_obs = envs[env_id].reset()
+                k = list(env_ids_out).index(env_id)
+                assert np.array_equal(obs['image'][k], ref_obs['image'])
+                assert rewards[k] == ref_reward
+                assert dones[k] == ref_done
+
+            # Only step the first half of the environments that completed
+            env_ids = env_ids_out[:2]
+
+        stats = pool.timing_stats()
+        assert stats['num_steps'].sum() == 4 + 29 * 2
+        assert np.all(stats['mean_reset_time'] > 0)
+    finally:
+        pool.close()
+
+
+def test_async_env_pool_threads():
+    _check_async_pool('thread')
+
+
+def test_async_env_pool_processes():
+    _check_async_pool('process')
+
+
+def test_async_env_pool_worker_errors():
+    pool = AsyncEnvPool([ENV_ID] * 2, num_workers=2, backend='process', seeds=[1, 2])
+    try:
+        pool.async_reset()
+        pool.recv(2)
+
+        # Errors raised by a worker are raised again by recv()
+        pool.send([99, 0], [0, 1])
+        with pytest.raises(AssertionError):
+            pool.recv(2)
+        _, _, _, env_ids = pool.recv(1)
+        assert list(env_ids) == [1]
+
+        # The worker keeps running after an error
+        pool.send([0], [0])
+        assert list(pool.recv(1)[3]) == [0]
+
+        # A dead worker doesn't block recv()
+        pool.workers[0].terminate()
+        pool.workers[0].join()
+        pool.send([0], [0])
+        with pytest.raises(RuntimeError):
+            pool.recv(1)
+    finally:
+        pool.close()
+
+
+def test_async_env_pool_pending_commands():
+    pool = AsyncEnvPool([ENV_ID] * 2, backend='thread', seeds=[1, 2])
+    try:
+        pool.async_reset()
+
+        # Environments can't receive a command before recv() returns the
+        # previous one
+        with pytest.raises(ValueError):
+            pool.send([0], [1])
+        with pytest.raises(ValueError):
+            pool.async_reset([0])
+        pool.recv(2)
+
+        with pytest.raises(ValueError):
+            pool.send([0, 1], [0, 0])
+        pool.send([0], [0])
+        assert pool.num_pending == 1
+        assert list(pool.recv(1)[3]) == [0]
+        pool.send([0, 1], [0, 1])
+        assert pool.num_pending == 2
+    finally:
+        pool.close()
+
+
+def test_async_env_pool_unpicklable_errors():
+    pool = AsyncEnvPool([make_failing_env], backend='process', context='fork')
+    try:
+        pool.async_reset()
+        pool.recv(1)
+
+        # The error is sent back as its traceback
+        pool.send([0], [0])
+        with pytest.raises(RuntimeError, match='UnpicklableError'):
+            pool.recv(1)
+        assert pool.num_pending == 0
+    finally:
+        pool.close()
@@ -0,0 +1,165 @@
+import numpy as np
+
+from gym_minigrid.envs.doorkey import DoorKeyEnv
+from gym_minigrid.envs.empty import EmptyEnv
+from gym_minigrid.wrappers import (
+    FlatObsWrapper,
+    FrameStackWrapper,
+    FullyObsWrapper,
+    ImgObsWrapper,
+    OneHotPartialObsWrapper,
+    RGBImgObsWrapper,
+    RGBImgPartialObsWrapper,
+    StateBonus,
+    observe,
+    step_many,
+    step_no_obs,
+)
+
+
+def _check_frame_stack(make_env, num_frames=3, capacity=5):
+    env = FrameStackWrapper(make_env(), num_frames=num_frames, capacity=capacity)
+    ref_env = make_env()
+
+    def image(obs):
+        return obs['image'] if isinstance(obs, dict) else obs
+
+    obs = env.reset()
+    history = [image(ref_env.reset()).copy()] * num_frames
+    assert image(obs).shape == (num_frames,) + history[0].shape
+
+    for step in range(12):
+        action = [0, 2, 1, 2][step % 4]
+        obs, _, _, _ = env.step(action)
+        ref_obs, _, _, _ = ref_env.step(action)
+        history = history[1:] + [image(ref_obs).copy()]
+        assert np.array_equal(image(obs), np.stack(history))
+
+
+def test_frame_stack_compact_encoding():
+    _check_frame_stack(lambda: DoorKeyEnv(size=6))
+
+
+def test_frame_stack_one_hot_encoding():
+    _check_frame_stack(lambda: ImgObsWrapper(OneHotPartialObsWrapper(DoorKeyEnv(size=6))))
+
+
+def test_frame_stack_rgb_encoding():
+    _check_frame_stack(lambda: RGBImgPartialObsWrapper(DoorKeyEnv(size=6)))
+
+
+def test_level_prefetch_is_deterministic():
+    import gym
+    import gym_minigrid
+    from gym_minigrid.wrappers import LevelPrefetchWrapper
+
+    for env_id in ['MiniGrid-MultiRoom-N4-S5-v0', 'MiniGrid-ObstructedMaze-1Dlhb-v0']:
+        sync_env = LevelPrefetchWrapper(gym.make(env_id), seed=3, prefetch=False)
+        async_env = LevelPrefetchWrapper(gym.make(env_id), seed=3, prefetch=True)
+
+        grids = []
+        for episode in range(4):
+            sync_obs = sync_env.reset()
+            async_obs = async_env.reset()
+            assert sync_env.unwrapped.grid == async_env.unwrapped.grid
+            assert np.array_equal(sync_obs['image'], async_obs['image'])
+            grids.append(sync_env.unwrapped.grid.encode())
+
+            for action in [0, 2, 2, 1, 2]:
+                sync_obs, _, _, _ = sync_env.step(action)
+                async_obs, _, _, _ = async_env.step(action)
+                assert np.array_equal(sync_obs['image'], async_obs['image'])
+
+        # Each episode has its own level
+        assert not np.array_equal(grids[0], grids[1])
+        async_env.close()
+
+
+def test_step_no_obs_through_wrappers():
+    def make_env():
+        return FrameStackWrapper(StateBonus(FlatObsWrapper(FullyObsWrapper(DoorKeyEnv(size=6)))), num_frames=2)
+
+    env = make_env()
+    ref_env = make_env()
+    env.reset()
+    ref_env.reset()
+
+    for step in range(10):
+        action = [0, 2, 1, 2, 2][step % 5]
+        ref_obs, ref_reward, ref_done, _ = ref_env.step(action)
+        obs, reward, done, _ = step_no_obs(env, action)
+        assert obs is None
+        assert (reward, done) == (ref_reward, ref_done)
+
+        if step % 2 == 1:
+            obs = observe(env)
+            assert obs.dtype == ref_obs.dtype
+            assert np.array_equal(obs[-1], ref_obs[-1])
+
+    assert env.unwrapped.step_no_obs(0)[0] is None
+    assert np.array_equal(env.unwrapped.observe()['image'], env.unwrapped.gen_obs()['image'])
+
+
+def test_step_many_matches_steps():
+    def make_envs():
+        return [
+            EmptyEnv(size=5),
+            FrameStackWrapper(StateBonus(FullyObsWrapper(EmptyEnv(size=5))), num_frames=2),
+        ]
+
+    # The goal is reached by the fifth action
+    actions = [2, 2, 1, 2, 2, 0, 0]
+
+    for env, ref_env in zip(make_envs(), make_envs()):
+        for num_actions in [0, 3, len(actions)]:
+            env.reset()
+            ref_env.reset()
+
+            ref_obs = observe(ref_env)
+            ref_reward = 0
+            ref_done = False
+            num_steps = 0
+            for action in actions[:num_actions]:
+                ref_obs, reward, ref_done, _ = ref_env.step(action)
+                ref_reward += reward
+                num_steps += 1
+                if ref_done:
+                    break
+
+            obs, reward, done, info = env.step_many(actions[:num_actions])
+            assert info['num_steps'] == num_steps
+            assert (reward, done) == (ref_reward, ref_done)
+            # Stacked frames only include the last observation of the sequence
+            if isinstance(env, FrameStackWrapper):
+                assert np.array_equal(obs['image'][-1], ref_obs['image'][-1])
+            else:
+                assert np.array_equal(obs['image'], ref_obs['image'])
+
+    assert step_many(EmptyEnv(size=5), actions)[3]['num_steps'] == 5
+
+
+def test_wrapper_obs_buffers():
+    wrappers = [
+        OneHotPartialObsWrapper,
+        RGBImgObsWrapper,
+        RGBImgPartialObsWrapper,
+        FullyObsWrapper,
+        FlatObsWrapper,
+    ]
+
+    for wrapper in wrappers:
+        env = wrapper(DoorKeyEnv(size=6))
+        ref_env = wrapper(DoorKeyEnv(size=6))
+        buffer = np.full(env.image_shape, 7, dtype=env.image_dtype)
+        env.set_obs_buffers(buffer)
+
+        obs = env.reset()
+        ref_obs = ref_env.reset()
+        for step in range(8):
+            image = obs['image'] if isinstance(obs, dict) else obs
+            ref_image = ref_obs['image'] if isinstance(ref_obs, dict) else ref_obs
+            assert image is buffer
+            assert np.array_equal(image, ref_image)
+            action = [0, 2, 1, 2][step % 4]
+            obs, _, _, _ = env.step(action)
+            ref_obs, _, _, _ = ref_env.step(action)
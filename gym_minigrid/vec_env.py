@@ -0,0 +1,679 @@
+import time
+import queue
+import pickle
+import traceback
+import collections
+import threading
+import multiprocessing as mp
+
+import numpy as np
+import gym
+
+# Seconds AsyncEnvPool.recv() waits for a result before checking that its
+# workers are still alive
+RESULT_POLL_INTERVAL = 1.0
+
+class SharedArrays:
+    """
+    Set of numpy arrays laid out in a single block of shared memory.
+    The block can be attached by name from other processes.
+    """
+
+    def __init__(self, specs, name=None):
+        """
+        :param specs: list of (key, shape, dtype) tuples
+        :param name: name of an existing block to attach to, or None to
+            create a new block
+        """
+
+        from multiprocessing import shared_memory
+
+        self.specs = list(specs)
+
+        # Compute the offset of each array, keeping them 8-byte aligned
+        offsets = []
+        size = 0
+        for key, shape, dtype in self.specs:
+            offsets.append(size)
+            nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            size += (nbytes + 7) // 8 * 8
+
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        self.arrays = {}
+        for (key, shape, dtype), offset in zip(self.specs, offsets):
+            self.arrays[key] = np.ndarray(
+                shape,
+                dtype=dtype,
+                buffer=self.shm.buf,
+                offset=offset
+            )
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def close(self):
+        # Drop the array views before releasing the memory mapping
+        self.arrays = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def make_env(env_fn):
+    """
+    Create an environment from a registered id or from a callable
+    """
+
+    if isinstance(env_fn, str):
+        # Make sure the MiniGrid environments are registered
+        import gym_minigrid
+        return gym.make(env_fn)
+
+    return env_fn()
+
+def _make_shared_specs(env_fns, extra_specs=()):
+    """
+    Create one environment to query the spaces, and lay out the shared
+    arrays holding the observations, actions, rewards and done flags of
+    all the environments
+
+    :param extra_specs: list of (key, dtype) tuples of additional
+        per-environment arrays
+    :return: tuple (action_space, observation_space, specs)
+    """
+
+    probe = make_env(env_fns[0])
+    action_space = probe.action_space
+    obs_space = probe.observation_space
+    probe.close()
+
+    assert isinstance(obs_space, gym.spaces.Dict) and 'image' in obs_space.spaces, \
+        "environments must have dictionary observations with an 'image' key"
+    image_space = obs_space.spaces['image']
+
+    observation_space = gym.spaces.Dict({
+        'image': image_space,
+        'direction': gym.spaces.Discrete(4)
+    })
+
+    n = len(env_fns)
+    specs = [
+        ('image', (n,) + image_space.shape, image_space.dtype),
+        ('direction', (n,), np.int64),
+        ('actions', (n,), np.int64),
+        ('rewards', (n,), np.float64),
+        ('dones', (n,), np.bool_),
+    ]
+    specs += [(key, (n,), dtype) for key, dtype in extra_specs]
+
+    return action_space, observation_space, specs
+
+def _set_obs_buffers(env, image, direction):
+    """
+    Have the environment write its observations directly in shared memory.
+    This is skipped when wrappers change the shape of the image, in which
+    case the observations are copied by _write_obs().
+    """
+
+    unwrapped = env.unwrapped
+    view_shape = (unwrapped.agent_view_size, unwrapped.agent_view_size, 3)
+    if image.shape == view_shape and image.dtype == np.uint8:
+        unwrapped.set_obs_buffers(image, direction)
+
+def _write_obs(env, obs, image, direction):
+    """
+    Copy an observation returned by the wrappers of an environment in
+    shared memory, unless it is already there
+    """
+
+    if obs['image'] is not image:
+        image[...] = obs['image']
+
+    if 'direction' not in obs:
+        direction[...] = env.unwrapped.agent_dir
+    elif obs['direction'] is not direction:
+        direction[...] = obs['direction']
+
+def _shm_worker(conn, env_fns, seeds, shm_name, specs, start):
+    """
+    Worker process stepping a contiguous chunk of environments and
+    writing their observations, rewards and done flags in shared memory
+    """
+
+    shared = SharedArrays(specs, name=shm_name)
+    actions = shared['actions']
+    rewards = shared['rewards']
+    dones = shared['dones']
+
+    envs = []
+    buffers = []
+    for i, env_fn in enumerate(env_fns):
+        idx = start + i
+        env = make_env(env_fn)
+        if seeds is not None:
+            env.seed(seeds[i])
+
+        buffers.append((shared['image'][idx], shared['direction'][idx:idx+1]))
+        _set_obs_buffers(env, *buffers[i])
+        envs.append(env)
+
+    try:
+        while True:
+            cmd = conn.recv()
+
+            if cmd == 'step':
+                for i, env in enumerate(envs):
+                    idx = start + i
+                    obs, reward, done, _ = env.step(actions[idx])
+                    rewards[idx] = reward
+                    dones[idx] = done
+                    # Automatically start a new episode
+                    if done:
+                        obs = env.reset()
+                    _write_obs(env, obs, *buffers[i])
+                conn.send(None)
+
+            elif cmd == 'reset':
+                for i, env in enumerate(envs):
+                    _write_obs(env, env.reset(), *buffers[i])
+                    rewards[start + i] = 0
+                    dones[start + i] = False
+                conn.send(None)
+
+            elif cmd == 'mission':
+                conn.send([env.unwrapped.mission for env in envs])
+
+            elif cmd == 'close':
+                break
+
+            else:
+                assert False, "unknown command '%s'" % cmd
+    finally:
+        for env in envs:
+            env.close()
+        shared.close()
+        conn.close()
+
+class SharedMemoryVecEnv:
+    """
+    Vectorized environment stepping MiniGrid environments in worker processes.
+    The workers write the 'image' and 'direction' observations, the rewards
+    and the done flags directly into shared memory, so that only a short
+    command string is sent through a pipe at each step. Actions are also
+    passed through shared memory. Environments are automatically reset by
+    the workers at the end of an episode, in which case the observation
+    returned is the first observation of the next episode.
+
+    The arrays returned by reset() and step() are views of the shared
+    memory and are overwritten by the next call to step().
+
+    Environments may be wrapped, as long as the wrappers return dictionary
+    observations with an 'image' of the same shape for all environments.
+    The observations returned by the wrappers are copied in shared memory
+    when they differ from those of the base environment.
+    """
+
+    def __init__(self, env_fns, num_workers=None, seeds=None, context=None):
+        """
+        :param env_fns: list of registered environment ids or of picklable
+            callables creating an environment
+        :param num_workers: number of worker processes, defaults to the
+            number of environments or of CPUs, whichever is smaller
+        :param seeds: optional list of seeds, one per environment
+        :param context: multiprocessing start method
+        """
+
+        env_fns = list(env_fns)
+        self.num_envs = len(env_fns)
+        assert self.num_envs > 0
+
+        if num_workers is None:
+            num_workers = min(self.num_envs, mp.cpu_count())
+        num_workers = min(num_workers, self.num_envs)
+
+        if seeds is not None:
+            seeds = list(seeds)
+            assert len(seeds) == self.num_envs
+
+        self.action_space, self.observation_space, specs = _make_shared_specs(env_fns)
+        self.shared = SharedArrays(specs)
+
+        ctx = mp.get_context(context)
+
+        # Split the environments in contiguous chunks, one per worker
+        n = self.num_envs
+        bounds = np.linspace(0, n, num_workers + 1).astype(int)
+
+        self.conns = []
+        self.procs = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            parent_conn, child_conn = ctx.Pipe()
+            proc = ctx.Process(
+                target=_shm_worker,
+                args=(
+                    child_conn,
+                    env_fns[start:end],
+                    seeds[start:end] if seeds is not None else None,
+                    self.shared.name,
+                    specs,
+                    start
+                ),
+                daemon=True
+            )
+            proc.start()
+            child_conn.close()
+            self.conns.append(parent_conn)
+            self.procs.append(proc)
+
+        self.closed = False
+
+    def _obs(self):
+        return {
+            'image': self.shared['image'],
+            'direction': self.shared['direction']
+        }
+
+    def _broadcast(self, cmd):
+        for conn in self.conns:
+            conn.send(cmd)
+        return [conn.recv() for conn in self.conns]
+
+    def reset(self):
+        self._broadcast('reset')
+        return self._obs()
+
+    def step_async(self, actions):
+        self.shared['actions'][:] = actions
+        for conn in self.conns:
+            conn.send('step')
+
+    def step_wait(self):
+        for conn in self.conns:
+            conn.recv()
+
+        return (
+            self._obs(),
+            self.shared['rewards'],
+            self.shared['dones'],
+            [{} for _ in range(self.num_envs)]
+        )
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def get_missions(self):
+        """
+        Get the current mission string of each environment
+        """
+
+        missions = []
+        for chunk in self._broadcast('mission'):
+            missions.extend(chunk)
+        return missions
+
+    def close(self):
+        if self.closed:
+            return
+
+        for conn in self.conns:
+            try:
+                conn.send('close')
+            except (BrokenPipeError, EOFError):
+                pass
+        for proc in self.procs:
+            proc.join()
+        for conn in self.conns:
+            conn.close()
+
+        self.shared.close()
+        self.closed = True
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close()
+
+def _pool_worker(cmd_queue, result_queue, env_fns, env_ids, seeds, shared, timing):
+    """
+    Worker owning a set of environments from an AsyncEnvPool. Commands are
+    (name, env_id) tuples and each completed command is acknowledged by
+    putting (env_id, None) in the result queue, or (env_id, exc) if the
+    command raised the exception exc.
+    """
+
+    # Process workers receive the name and layout of the shared memory block
+    if isinstance(shared, tuple):
+        shared = SharedArrays(shared[1], name=shared[0])
+        owns_shared = True
+    else:
+        owns_shared = False
+
+    actions = shared['actions']
+    rewards = shared['rewards']
+    dones = shared['dones']
+
+    envs = {}
+    buffers = {}
+    for i, (env_fn, env_id) in enumerate(zip(env_fns, env_ids)):
+        env = make_env(env_fn)
+        if seeds is not None:
+            env.seed(seeds[i])
+        buffers[env_id] = (shared['image'][env_id], shared['direction'][env_id:env_id+1])
+        _set_obs_buffers(env, *buffers[env_id])
+        envs[env_id] = env
+
+    def timed_reset(env_id):
+        t0 = time.perf_counter()
+        _write_obs(envs[env_id], envs[env_id].reset(), *buffers[env_id])
+        if timing:
+            shared['reset_time'][env_id] += time.perf_counter() - t0
+            shared['num_resets'][env_id] += 1
+
+    try:
+        while True:
+            cmd = cmd_queue.get()
+            if cmd is None:
+                break
+            name, env_id = cmd
+
+            try:
+                if name == 'step':
+                    t0 = time.perf_counter()
+                    obs, reward, done, _ = envs[env_id].step(actions[env_id])
+                    if timing:
+                        shared['step_time'][env_id] += time.perf_counter() - t0
+                        shared['num_steps'][env_id] += 1
+                    rewards[env_id] = reward
+                    dones[env_id] = done
+                    # Automatically start a new episode
+                    if done:
+                        timed_reset(env_id)
+                    else:
+                        _write_obs(envs[env_id], obs, *buffers[env_id])
+
+                elif name == 'reset':
+                    timed_reset(env_id)
+                    rewards[env_id] = 0
+                    dones[env_id] = False
+
+                else:
+                    assert False, "unknown command '%s'" % name
+
+            except Exception as exc:
+                # Errors are raised again by recv() in the main process.
+                # Exceptions which can't be sent to it are replaced by their
+                # traceback, as the queue would otherwise drop them silently
+                # and leave recv() waiting forever
+                if owns_shared:
+                    try:
+                        pickle.dumps(exc)
+                    except Exception:
+                        exc = RuntimeError(traceback.format_exc())
+                result_queue.put((env_id, exc))
+                continue
+
+            result_queue.put((env_id, None))
+    finally:
+        for env in envs.values():
+            env.close()
+        if owns_shared:
+            shared.close()
+
+class AsyncEnvPool:
+    """
+    Pool of environments stepped asynchronously by thread or process
+    workers. Actions are submitted for any subset of the environments with
+    send(), and recv() returns the first batch_size environments to finish,
+    so that slow steps or resets (e.g. level generation in MultiRoom or
+    ObstructedMaze environments) do not hold back the other environments.
+    Environments are automatically reset at the end of an episode.
+
+    Usage:
+        pool.async_reset()
+        obs, rewards, dones, env_ids = pool.recv()
+        pool.send(actions, env_ids)
+    """
+
+    def __init__(
+        self,
+        env_fns,
+        batch_size=None,
+        num_workers=None,
+        backend='thread',
+        seeds=None,
+        timing=False,
+        context=None
+    ):
+        """
+        :param env_fns: list of registered environment ids or of picklable
+            callables creating an environment
+        :param batch_size: default number of environments returned by recv()
+        :param num_workers: number of workers, defaults to one per
+            environment for threads, and to the number of CPUs for processes
+        :param backend: 'thread' or 'process'
+        :param seeds: optional list of seeds, one per environment
+        :param timing: record per-environment step and reset times
+        :param context: multiprocessing start method (process backend only)
+        """
+
+        assert backend in ('thread', 'process'), backend
+
+        env_fns = list(env_fns)
+        self.num_envs = len(env_fns)
+        assert self.num_envs > 0
+
+        if batch_size is None:
+            batch_size = self.num_envs
+        assert 0 < batch_size <= self.num_envs
+        self.batch_size = batch_size
+
+        if num_workers is None:
+            num_workers = self.num_envs if backend == 'thread' else mp.cpu_count()
+        num_workers = max(1, min(num_workers, self.num_envs))
+
+        if seeds is not None:
+            seeds = list(seeds)
+            assert len(seeds) == self.num_envs
+
+        self.action_space, self.observation_space, specs = _make_shared_specs(
+            env_fns,
+            extra_specs=[
+                ('step_time', np.float64),
+                ('num_steps', np.int64),
+                ('reset_time', np.float64),
+                ('num_resets', np.int64),
+            ]
+        )
+
+        self.backend = backend
+        if backend == 'thread':
+            self.shared = {key: np.zeros(shape, dtype=dtype) for key, shape, dtype in specs}
+            self.result_queue = queue.Queue()
+        else:
+            ctx = mp.get_context(context)
+            self.shared = SharedArrays(specs)
+            self.result_queue = ctx.Queue()
+
+        # Environments are assigned to workers in round-robin order
+        n = self.num_envs
+        self.env_worker = [i % num_workers for i in range(n)]
+
+        self.cmd_queues = []
+        self.workers = []
+        for w in range(num_workers):
+            env_ids = [i for i in range(n) if self.env_worker[i] == w]
+
+            if backend == 'thread':
+                cmd_queue = queue.Queue()
+                shared = self.shared
+                worker_cls = threading.Thread
+            else:
+                cmd_queue = ctx.Queue()
+                shared = (self.shared.name, specs)
+                worker_cls = ctx.Process
+
+            worker = worker_cls(
+                target=_pool_worker,
+                args=(
+                    cmd_queue,
+                    self.result_queue,
+                    [env_fns[i] for i in env_ids],
+                    env_ids,
+                    [seeds[i] for i in env_ids] if seeds is not None else None,
+                    shared,
+                    timing
+                ),
+                daemon=True
+            )
+            worker.start()
+
+            self.cmd_queues.append(cmd_queue)
+            self.workers.append(worker)
+
+        # Environments with a command which wasn't returned by recv() yet,
+        # and environments whose command completed but which weren't
+        # returned by recv() yet
+        self.pending = set()
+        self.ready = collections.deque()
+        self.closed = False
+
+    @property
+    def num_pending(self):
+        return len(self.pending)
+
+    def _check_not_pending(self, env_ids):
+        """
+        Raise an error if a command is submitted twice to an environment
+        before recv() returns it, as the second command would overwrite the
+        action or the results of the first one in the shared arrays
+        """
+
+        counts = collections.Counter(env_ids)
+        busy = sorted(i for i in counts if i in self.pending or counts[i] > 1)
+        if busy:
+            raise ValueError('environments %s already have a pending command' % busy)
+
+    def _submit(self, name, env_ids):
+        env_ids = [int(env_id) for env_id in env_ids]
+        self._check_not_pending(env_ids)
+
+        for env_id in env_ids:
+            self.cmd_queues[self.env_worker[env_id]].put((name, env_id))
+        self.pending.update(env_ids)
+
+    def async_reset(self, env_ids=None):
+        """
+        Start resetting the given environments (all of them by default)
+        """
+
+        if env_ids is None:
+            env_ids = range(self.num_envs)
+        self._submit('reset', list(env_ids))
+
+    def send(self, actions, env_ids=None):
+        """
+        Submit one action for each of the given environments
+        """
+
+        if env_ids is None:
+            env_ids = np.arange(self.num_envs)
+        env_ids = np.asarray(env_ids, dtype=np.int64)
+        assert len(actions) == len(env_ids)
+
+        self._check_not_pending(env_ids.tolist())
+        self.shared['actions'][env_ids] = actions
+        self._submit('step', env_ids)
+
+    def recv(self, batch_size=None):
+        """
+        Wait until batch_size environments have completed their command
+        and return (obs, rewards, dones, env_ids) for these environments
+        """
+
+        if batch_size is None:
+            batch_size = min(self.batch_size, self.num_pending)
+        assert 0 < batch_size <= self.num_pending, "not enough pending environments"
+
+        env_ids = []
+        while len(env_ids) < batch_size:
+            if self.ready:
+                env_ids.append(self.ready.popleft())
+                continue
+
+            env_id, error = self._get_result()
+            if error is not None:
+                # Keep the environments which completed for the next call
+                self.pending.discard(env_id)
+                self.ready.extendleft(reversed(env_ids))
+                raise error
+            env_ids.append(env_id)
+
+        self.pending.difference_update(env_ids)
+        env_ids = np.array(env_ids, dtype=np.int64)
+
+        obs = {
+            'image': self.shared['image'][env_ids],
+            'direction': self.shared['direction'][env_ids]
+        }
+
+        return (
+            obs,
+            self.shared['rewards'][env_ids],
+            self.shared['dones'][env_ids],
+            env_ids
+        )
+
+    def _get_result(self):
+        """
+        Wait for the result of a command, raising an error if a worker
+        died, which would otherwise block the caller forever
+        """
+
+        while True:
+            try:
+                return self.result_queue.get(timeout=RESULT_POLL_INTERVAL)
+            except queue.Empty:
+                for worker in self.workers:
+                    if not worker.is_alive():
+                        raise RuntimeError('an AsyncEnvPool worker died')
+
+    def timing_stats(self):
+        """
+        Mean step and reset time in seconds for each environment
+        (only recorded when the pool is created with timing=True)
+        """
+
+        num_steps = self.shared['num_steps']
+        num_resets = self.shared['num_resets']
+
+        return {
+            'mean_step_time': self.shared['step_time'] / np.maximum(num_steps, 1),
+            'mean_reset_time': self.shared['reset_time'] / np.maximum(num_resets, 1),
+            'num_steps': num_steps.copy(),
+            'num_resets': num_resets.copy()
+        }
+
+    def close(self):
+        if self.closed:
+            return
+
+        for cmd_queue in self.cmd_queues:
+            cmd_queue.put(None)
+        for worker in self.workers:
+            worker.join()
+
+        if self.backend == 'process':
+            self.shared.close()
+        self.closed = True
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close()
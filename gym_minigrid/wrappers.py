@@ -1,13 +1,108 @@
+import copy
 import math
 import operator
 from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import gym
 from gym import error, spaces, utils
 from .minigrid import OBJECT_TO_IDX, COLOR_TO_IDX, STATE_TO_IDX
 
-class ReseedWrapper(gym.core.Wrapper):
+class Wrapper(gym.core.Wrapper):
+    """
+    Wrapper whose step_many() method goes through the wrappers below it,
+    see step_many()
+    """
+
+    def step_many(self, actions):
+        return step_many(self, actions)
+
+class ObservationWrapper(gym.core.ObservationWrapper):
+    """
+    Observation wrapper which passes on the None observations returned
+    by step_no_obs() instead of transforming them
+    """
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        if obs is not None:
+            obs = self.observation(obs)
+        return obs, reward, done, info
+
+    def step_many(self, actions):
+        return step_many(self, actions)
+
+def step_no_obs(env, action):
+    """
+    Perform an action through a stack of wrappers without generating the
+    observation, which is returned as None, see MiniGridEnv.step_no_obs().
+    Rewards and episode ends are still processed by the wrappers. The
+    observation wrappers must be subclasses of ObservationWrapper.
+    """
+
+    base = env.unwrapped
+    base._skip_obs = True
+    try:
+        return env.step(action)
+    finally:
+        base._skip_obs = False
+
+def step_many(env, actions):
+    """
+    Perform a sequence of actions through a stack of wrappers, stopping
+    early at the end of the episode, see MiniGridEnv.step_many(). The
+    wrappers process the reward of every action, and the observation is
+    only generated after the last one. The rewards are summed and
+    info['num_steps'] is the number of actions performed.
+    """
+
+    if env is env.unwrapped:
+        return env.step_many(actions)
+
+    actions = list(actions)
+    total_reward = 0
+    obs = None
+    done = False
+    info = {}
+    num_steps = 0
+
+    for idx, action in enumerate(actions):
+        # The last step goes through step(), so that wrappers which keep
+        # track of observations, e.g. FrameStackWrapper, see its observation
+        if idx == len(actions) - 1:
+            obs, reward, done, info = env.step(action)
+        else:
+            _, reward, done, info = step_no_obs(env, action)
+        total_reward += reward
+        num_steps += 1
+        if done:
+            break
+
+    if obs is None:
+        obs = observe(env)
+
+    info = dict(info, num_steps=num_steps)
+    return obs, total_reward, done, info
+
+def observe(env):
+    """
+    Generate the observation of the current state through a stack of
+    wrappers, e.g. after step_no_obs()
+    """
+
+    if env is env.unwrapped:
+        return env.observe()
+
+    obs = observe(env.env)
+
+    if isinstance(env, gym.core.ObservationWrapper):
+        return env.observation(obs)
+    if isinstance(env, FrameStackWrapper):
+        return env.peek(obs)
+    return obs
+
+class ReseedWrapper(Wrapper):
     """
     Wrapper to always regenerate an environment with the same set of seeds.
     This can be used to force an environment to always keep the same
@@ -29,7 +124,82 @@ class ReseedWrapper(gym.core.Wrapper):
         obs, reward, done, info = self.env.step(action)
         return obs, reward, done, info
 
-class ActionBonus(gym.core.Wrapper):
+class LevelPrefetchWrapper(Wrapper):
+    """
+    Wrapper generating the level of episode k from its own seed, derived
+    from a base seed and k. With prefetch=True, a helper thread generates
+    the level of the next episode while the current one runs, so that
+    reset() only has to swap it in. The sequence of levels is the same
+    with and without prefetching.
+
+    The helper thread works on a copy of the environment made when the
+    wrapper is created. Generation runs concurrently with the rest of the
+    program only while the main thread doesn't hold the GIL, e.g. during
+    neural network inference or I/O.
+    """
+
+    def __init__(self, env, seed=0, prefetch=True):
+        super().__init__(env)
+
+        self.prefetch = prefetch
+        self.base_seed = seed
+        self.episode_idx = 0
+
+        if prefetch:
+            self.level_env = copy.deepcopy(env.unwrapped)
+            self.level_env.window = None
+            self.level_env.obs_buffers = None
+            self.executor = ThreadPoolExecutor(max_workers=1)
+            self.next_level = None
+
+    def seed(self, seed=0):
+        self.base_seed = seed
+        self.episode_idx = 0
+        if self.prefetch:
+            # Any level being generated is for the old seed
+            self.next_level = None
+        return [seed]
+
+    def episode_seed(self, episode_idx):
+        """
+        Seed used to generate the level of a given episode
+        """
+
+        seq = np.random.SeedSequence(self.base_seed, spawn_key=(episode_idx,))
+        return int(seq.generate_state(1)[0])
+
+    def _gen_level(self, seed):
+        self.level_env.seed(seed)
+        return self.level_env.gen_level_state()
+
+    def _submit(self, episode_idx):
+        seed = self.episode_seed(episode_idx)
+        self.next_level = self.executor.submit(self._gen_level, seed)
+
+    def reset(self, **kwargs):
+        episode_idx = self.episode_idx
+        self.episode_idx += 1
+
+        if not self.prefetch:
+            self.env.seed(self.episode_seed(episode_idx))
+            return self.env.reset(**kwargs)
+
+        if self.next_level is None:
+            self._submit(episode_idx)
+        level = self.next_level.result()
+
+        # Start generating the level of the next episode
+        self._submit(self.episode_idx)
+
+        self.env.unwrapped.set_next_level(level)
+        return self.env.reset(**kwargs)
+
+    def close(self):
+        if self.prefetch:
+            self.executor.shutdown(wait=True)
+        return super().close()
+
+class ActionBonus(Wrapper):
     """
     Wrapper which adds an exploration bonus.
     This is a reward to encourage exploration of less
@@ -63,7 +233,7 @@ class ActionBonus(gym.core.Wrapper):
     def reset(self, **kwargs):
         return self.env.reset(**kwargs)
 
-class StateBonus(gym.core.Wrapper):
+class StateBonus(Wrapper):
     """
     Adds an exploration bonus based on which positions
     are visited on the grid.
@@ -98,7 +268,7 @@ class StateBonus(gym.core.Wrapper):
     def reset(self, **kwargs):
         return self.env.reset(**kwargs)
 
-class ImgObsWrapper(gym.core.ObservationWrapper):
+class ImgObsWrapper(ObservationWrapper):
     """
     Use the image as the only observation output, no language/mission.
     """
@@ -110,7 +280,44 @@ class ImgObsWrapper(gym.core.ObservationWrapper):
     def observation(self, obs):
         return obs['image']
 
-class OneHotPartialObsWrapper(gym.core.ObservationWrapper):
+class BufferedObsWrapper(ObservationWrapper):
+    """
+    Observation wrapper which can write the images it produces into a
+    caller-provided buffer, see set_obs_buffers()
+    """
+
+    # Type of the images produced
+    image_dtype = np.uint8
+
+    # Caller-provided image buffer
+    obs_buffer = None
+
+    def set_obs_buffers(self, image=None):
+        """
+        Make the wrapper write its observation images into a caller-provided
+        array instead of allocating a new one at every step, like
+        MiniGridEnv.set_obs_buffers(). The observations returned then hold
+        a view of this buffer, so they must be consumed or copied before
+        stepping again. Calling this method without arguments restores the
+        default mode. The observations of the wrapped environment still
+        use their own buffers, if any.
+
+        :param image: array with the shape and type of the images produced
+        """
+
+        if image is not None:
+            assert image.shape == self.image_shape, image.shape
+            assert image.dtype == self.image_dtype, image.dtype
+        self.obs_buffer = image
+
+    @property
+    def image_shape(self):
+        space = self.observation_space
+        if isinstance(space, spaces.Dict):
+            space = space.spaces['image']
+        return space.shape
+
+class OneHotPartialObsWrapper(BufferedObsWrapper):
     """
     Wrapper to get a one-hot encoding of a partially observable
     agent view as observation.
@@ -135,7 +342,11 @@ class OneHotPartialObsWrapper(gym.core.ObservationWrapper):
 
     def observation(self, obs):
         img = obs['image']
-        out = np.zeros(self.observation_space.spaces['image'].shape, dtype='uint8')
+        if self.obs_buffer is None:
+            out = np.zeros(self.image_shape, dtype='uint8')
+        else:
+            out = self.obs_buffer
+            out.fill(0)
 
         for i in range(img.shape[0]):
             for j in range(img.shape[1]):
@@ -152,7 +363,7 @@ class OneHotPartialObsWrapper(gym.core.ObservationWrapper):
             'image': out
         }
 
-class RGBImgObsWrapper(gym.core.ObservationWrapper):
+class RGBImgObsWrapper(BufferedObsWrapper):
     """
     Wrapper to use fully observable RGB image as the only observation output,
     no language/mission. This can be used to have the agent to solve the
@@ -174,10 +385,13 @@ class RGBImgObsWrapper(gym.core.ObservationWrapper):
     def observation(self, obs):
         env = self.unwrapped
 
-        rgb_img = env.render(
-            mode='rgb_array',
-            highlight=False,
-            tile_size=self.tile_size
+        # Same as env.render(mode='rgb_array', highlight=False), without
+        # computing the cells visible to the agent
+        rgb_img = env.grid.render(
+            self.tile_size,
+            env.agent_pos,
+            env.agent_dir,
+            out=self.obs_buffer
         )
 
         return {
@@ -186,7 +400,7 @@ class RGBImgObsWrapper(gym.core.ObservationWrapper):
         }
 
 
-class RGBImgPartialObsWrapper(gym.core.ObservationWrapper):
+class RGBImgPartialObsWrapper(BufferedObsWrapper):
     """
     Wrapper to use partially observable RGB image as the only observation output
     This can be used to have the agent to solve the gridworld in pixel space.
@@ -210,7 +424,8 @@ class RGBImgPartialObsWrapper(gym.core.ObservationWrapper):
 
         rgb_img_partial = env.get_obs_render(
             obs['image'],
-            tile_size=self.tile_size
+            tile_size=self.tile_size,
+            out=self.obs_buffer
         )
 
         return {
@@ -218,7 +433,7 @@ class RGBImgPartialObsWrapper(gym.core.ObservationWrapper):
             'image': rgb_img_partial
         }
 
-class FullyObsWrapper(gym.core.ObservationWrapper):
+class FullyObsWrapper(BufferedObsWrapper):
     """
     Fully observable gridworld using a compact grid encoding
     """
@@ -235,7 +450,7 @@ class FullyObsWrapper(gym.core.ObservationWrapper):
 
     def observation(self, obs):
         env = self.unwrapped
-        full_grid = env.grid.encode()
+        full_grid = env.grid.encode(out=self.obs_buffer)
         full_grid[env.agent_pos[0]][env.agent_pos[1]] = np.array([
             OBJECT_TO_IDX['agent'],
             COLOR_TO_IDX['red'],
@@ -247,7 +462,7 @@ class FullyObsWrapper(gym.core.ObservationWrapper):
             'image': full_grid
         }
 
-class FlatObsWrapper(gym.core.ObservationWrapper):
+class FlatObsWrapper(BufferedObsWrapper):
     """
     Encode mission strings using a one-hot scheme,
     and combine these with observed images into one flat array
@@ -272,6 +487,9 @@ class FlatObsWrapper(gym.core.ObservationWrapper):
         self.cachedStr = None
         self.cachedArray = None
 
+    # The image is concatenated with the float32 mission encoding
+    image_dtype = np.float32
+
     def observation(self, obs):
         image = obs['image']
         mission = obs['mission']
@@ -294,11 +512,119 @@ class FlatObsWrapper(gym.core.ObservationWrapper):
             self.cachedStr = mission
             self.cachedArray = strArray
 
-        obs = np.concatenate((image.flatten(), self.cachedArray.flatten()))
+        obs = np.concatenate((image.ravel(), self.cachedArray.ravel()), out=self.obs_buffer)
 
         return obs
 
-class ViewSizeWrapper(gym.core.Wrapper):
+class FrameStackWrapper(Wrapper):
+    """
+    Stack the last num_frames image observations along a new leading axis.
+    This works with any of the image encodings produced by this package
+    (compact, one-hot or RGB, partial or full), either inside an observation
+    dictionary or as produced by ImgObsWrapper.
+
+    Frames are kept in a sliding window buffer holding `capacity` frames, so
+    that each step copies only the newest frame and the stacked observation
+    is a strided view into that buffer. When the window reaches the end of
+    the buffer, the last num_frames-1 frames are moved back to the front.
+    The returned view is only valid until the next call to step() or reset().
+    """
+
+    def __init__(self, env, num_frames=4, capacity=None):
+        super().__init__(env)
+
+        assert num_frames >= 1
+        if capacity is None:
+            capacity = 8 * num_frames
+        assert capacity >= num_frames
+
+        self.num_frames = num_frames
+        self.capacity = capacity
+
+        # Observations may be dictionaries (with an 'image' field) or images
+        self.is_dict = isinstance(env.observation_space, spaces.Dict)
+        if self.is_dict:
+            img_space = env.observation_space.spaces['image']
+        else:
+            img_space = env.observation_space
+
+        stacked_space = spaces.Box(
+            low=np.broadcast_to(img_space.low, (num_frames,) + img_space.shape),
+            high=np.broadcast_to(img_space.high, (num_frames,) + img_space.shape),
+            dtype=img_space.dtype
+        )
+
+        if self.is_dict:
+            self.observation_space = spaces.Dict(dict(
+                env.observation_space.spaces,
+                image=stacked_space
+            ))
+        else:
+            self.observation_space = stacked_space
+
+        self.frames = np.zeros((capacity,) + img_space.shape, dtype=img_space.dtype)
+
+        # Index one past the newest frame in the buffer
+        self.end = 0
+
+    def reset(self, **kwargs):
+        obs = self.env.reset(**kwargs)
+
+        # Fill the whole window with the first frame
+        self.frames[:self.num_frames] = self._get_image(obs)
+        self.end = self.num_frames
+
+        return self._stacked_obs(obs)
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+
+        # Steps without observations, see step_no_obs(), aren't stacked
+        if obs is None:
+            return None, reward, done, info
+
+        # Move the window back to the front of the buffer when it is full
+        if self.end == self.capacity:
+            keep = self.num_frames - 1
+            self.frames[:keep] = self.frames[self.end - keep:self.end]
+            self.end = keep
+
+        self.frames[self.end] = self._get_image(obs)
+        self.end += 1
+
+        return self._stacked_obs(obs), reward, done, info
+
+    def peek(self, obs):
+        """
+        Stacked observation the wrapper would return for an observation
+        of the wrapped environment, without adding it to the frames
+        """
+
+        stacked = np.empty((self.num_frames,) + self.frames.shape[1:], dtype=self.frames.dtype)
+        stacked[:-1] = self.frames[self.end - self.num_frames + 1:self.end]
+        stacked[-1] = self._get_image(obs)
+
+        if self.is_dict:
+            obs = dict(obs)
+            obs['image'] = stacked
+            return obs
+
+        return stacked
+
+    def _get_image(self, obs):
+        return obs['image'] if self.is_dict else obs
+
+    def _stacked_obs(self, obs):
+        stacked = self.frames[self.end - self.num_frames:self.end]
+
+        if self.is_dict:
+            obs = dict(obs)
+            obs['image'] = stacked
+            return obs
+
+        return stacked
+
+class ViewSizeWrapper(Wrapper):
     """
     Wrapper to customize the agent field of view size.
     This cannot be used with fully observable wrappers.
@@ -332,8 +658,7 @@ class ViewSizeWrapper(gym.core.Wrapper):
     def step(self, action):
         return self.env.step(action)
 
-from .minigrid import Goal
-class DirectionObsWrapper(gym.core.ObservationWrapper):
+class DirectionObsWrapper(ObservationWrapper):
     """
     Provides the slope/angular direction to the goal with the observations as modeled by (y2 - y2 )/( x2 - x1)
     type = {slope , angle}
@@ -346,9 +671,9 @@ class DirectionObsWrapper(gym.core.ObservationWrapper):
     def reset(self):
         obs = self.env.reset()
         if not self.goal_position:
-            self.goal_position = [x for x,y in enumerate(self.grid.grid) if isinstance(y,(Goal) ) ]
-            if len(self.goal_position) >= 1: # in case there are multiple goals , needs to be handled for other env types
-                self.goal_position = (int(self.goal_position[0]/self.height) , self.goal_position[0]%self.width)
+            goal_positions = self.grid.find('goal')
+            if len(goal_positions) >= 1: # in case there are multiple goals , needs to be handled for other env types
+                self.goal_position = goal_positions[0]
         return obs
 
     def observation(self, obs):
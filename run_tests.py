@@ -105,6 +105,13 @@ for env_idx, env_name in enumerate(env_list):
     env.step(0)
     env.close()
 
+    env = gym.make(env_name)
+    env = FrameStackWrapper(env, 4)
+    obs = env.reset()
+    obs, _, _, _ = env.step(0)
+    assert obs['image'].shape == env.observation_space.spaces['image'].shape
+    env.close()
+
     env = gym.make(env_name)
     env = ViewSizeWrapper(env, 5)
     env.reset()